@@ -0,0 +1,201 @@
+# fast_api/bench.py
+# Бенчмарк генераторов на синтетической школе заданного размера.
+# Запуск: python -m fast_api.bench --classes 33 --teachers 60 --out bench.json
+# Каждый режим работает на своей базе SQLite (по умолчанию в памяти) и
+# измеряется по времени, пиковой памяти, непоставленным урокам, накладкам и окнам.
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from .models import Base, SchoolClass, Subject, Room, Teacher, Lesson
+from .genetic import CurriculumItem, generate_random_schedule, generate_genetic_schedule
+from .islands import generate_island_schedule
+from .solver import generate_solver_schedule
+from .localsearch import optimize_schedule
+from .occupancy import Occupancy
+from .persist import active_lessons
+from .metrics import generation_run
+
+
+def _run_greedy(db, curriculum, seed, options):
+    return generate_random_schedule(db, curriculum=curriculum, seed=seed)
+
+
+def _run_genetic(db, curriculum, seed, options):
+    return generate_genetic_schedule(db, curriculum=curriculum, seed=seed,
+                                     population_size=options.population, generations=options.generations)
+
+
+def _run_islands(db, curriculum, seed, options):
+    return generate_island_schedule(db, curriculum=curriculum, seed=seed, workers=options.workers,
+                                    population_size=options.population, generations=options.generations)
+
+
+def _run_solver(db, curriculum, seed, options):
+    return generate_solver_schedule(db, curriculum=curriculum, seed=seed)
+
+
+def _run_optimize(db, curriculum, seed, options):
+    # Доводка поверх решателя: время считается за обе стадии
+    generate_solver_schedule(db, curriculum=curriculum, seed=seed)
+    return optimize_schedule(db, curriculum=curriculum, seed=seed, time_limit=options.time_limit)
+
+
+MODES = {
+    "greedy": _run_greedy,
+    "genetic": _run_genetic,
+    "islands": _run_islands,
+    "solver": _run_solver,
+    "optimize": _run_optimize,
+}
+
+
+def build_school(db, classes=33, teachers=48, rooms=30, subjects=12, hours=30,
+                 special_subjects=2, special_rooms=3, seed=0):
+    # Синтетическая школа: обычные предметы идут в любой обычный кабинет,
+    # «специальные» (физкультура, химия…) — только в special_rooms своих кабинетов
+    rng = random.Random(seed)
+
+    class_rows = [SchoolClass(number=i // 3 + 1, letter="АБВГДЕЖЗ"[i % 3]) for i in range(classes)]
+    teacher_rows = [Teacher(name=f"Учитель {i + 1}") for i in range(teachers)]
+    general_rooms = [Room(name=f"Кабинет {i + 1}") for i in range(rooms)]
+    special_room_rows = {
+        s: [Room(name=f"Спецкабинет {s + 1}.{k + 1}") for k in range(special_rooms)]
+        for s in range(special_subjects)
+    }
+    db.add_all(class_rows + teacher_rows + general_rooms
+               + [r for group in special_room_rows.values() for r in group])
+    db.flush()
+
+    # Часы класса раскладываются по предметам примерно поровну
+    weights = [rng.uniform(0.5, 1.5) for _ in range(subjects)]
+    subject_hours = [max(1, round(hours * w / sum(weights))) for w in weights]
+
+    # Учителя распределяются по предметам пропорционально нагрузке
+    teachers_by_subject = {s: [] for s in range(subjects)}
+    load = sorted(range(subjects), key=lambda s: -subject_hours[s])
+    for i, teacher in enumerate(teacher_rows):
+        teachers_by_subject[load[i % subjects]].append(teacher)
+
+    subject_rows = []
+    for s in range(subjects):
+        subject_teacher = teachers_by_subject[s][0] if teachers_by_subject[s] else None
+        subject_rows.append(Subject(name=f"Предмет {s + 1}", hours_per_week=subject_hours[s],
+                                    teacher_id=subject_teacher.id if subject_teacher else None))
+    db.add_all(subject_rows)
+    db.flush()
+
+    curriculum = []
+    teacher_load = {t.id: 0 for t in teacher_rows}
+    for school_class in class_rows:
+        for s, subject in enumerate(subject_rows):
+            pool = teachers_by_subject[s] or teacher_rows
+            teacher = min(pool, key=lambda t: teacher_load[t.id])
+            teacher_load[teacher.id] += subject_hours[s]
+            room_group = special_room_rows.get(s, general_rooms)
+            curriculum.append(CurriculumItem(school_class.id, subject.id, teacher.id,
+                                             tuple(r.id for r in room_group), subject_hours[s]))
+    db.commit()
+    return curriculum
+
+
+def evaluate_schedule(db, curriculum):
+    lessons = active_lessons(db).with_entities(
+        Lesson.class_id, Lesson.teacher_id, Lesson.room_id, Lesson.day, Lesson.lesson_number
+    ).all()
+    occupancy = Occupancy()
+    clashes = 0
+    for l in lessons:
+        if occupancy.conflicts(l.class_id, l.teacher_id, l.room_id, l.day, l.lesson_number):
+            clashes += 1
+        occupancy.place(l.class_id, l.teacher_id, l.room_id, l.day, l.lesson_number)
+    required = sum(item.hours for item in curriculum)
+    return {
+        "lessons_required": required,
+        "lessons_placed": len(lessons),
+        "unplaced": required - len(lessons),
+        "clashes": clashes,
+        "windows": occupancy.class_windows(),
+    }
+
+
+def run_mode(mode, options, database):
+    engine = create_engine(database)
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        curriculum = build_school(db, classes=options.classes, teachers=options.teachers, rooms=options.rooms,
+                                  subjects=options.subjects, hours=options.hours,
+                                  special_subjects=options.special_subjects,
+                                  special_rooms=options.special_rooms, seed=options.seed)
+        tracemalloc.start()
+        started = time.perf_counter()
+        with generation_run(mode) as run:
+            MODES[mode](db, curriculum, options.seed, options)
+        wall_time = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        result = {"mode": mode, "wall_time": round(wall_time, 4), "peak_memory_kb": peak // 1024}
+        result.update(evaluate_schedule(db, curriculum))
+        summary = run.summary()
+        result["phases"] = summary["phases"]
+        result["counters"] = summary["counters"]
+        return result
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Бенчмарк генераторов расписания")
+    parser.add_argument("--modes", default=",".join(MODES), help="режимы через запятую")
+    parser.add_argument("--classes", type=int, default=33)
+    parser.add_argument("--teachers", type=int, default=48)
+    parser.add_argument("--rooms", type=int, default=30, help="обычных кабинетов")
+    parser.add_argument("--subjects", type=int, default=12)
+    parser.add_argument("--hours", type=int, default=30, help="уроков в неделю у класса")
+    parser.add_argument("--special-subjects", type=int, default=2)
+    parser.add_argument("--special-rooms", type=int, default=3, help="кабинетов на спецпредмет")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--population", type=int, default=200)
+    parser.add_argument("--generations", type=int, default=500)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--time-limit", type=float, default=10.0, help="бюджет локального поиска, с")
+    parser.add_argument("--database", default="sqlite://", help="URL базы; по умолчанию SQLite в памяти")
+    parser.add_argument("--out", default="bench.json")
+    options = parser.parse_args(argv)
+
+    results = []
+    for mode in options.modes.split(","):
+        if mode not in MODES:
+            parser.error(f"неизвестный режим {mode}")
+        result = run_mode(mode, options, options.database)
+        print(f"📊 {mode}: {result['wall_time']} с, {result['peak_memory_kb']} КБ, "
+              f"не поставлено {result['unplaced']}, накладок {result['clashes']}, окон {result['windows']}")
+        results.append(result)
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(timespec="seconds"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "school": {k: getattr(options, k) for k in
+                   ("classes", "teachers", "rooms", "subjects", "hours", "special_subjects", "special_rooms", "seed")},
+        "results": results,
+    }
+    with open(options.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"✅ Результаты записаны в {options.out}")
+
+
+if __name__ == "__main__":
+    main()
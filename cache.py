@@ -0,0 +1,127 @@
+# fast_api/cache.py
+# LRU-кэш сеток класса для /schedule. Ключ — (class_id, monday): monday=None —
+# недельный шаблон класса, дата понедельника — собранная неделя с исключениями.
+# Записи сбрасываются точечно для классов, которых коснулось изменение, —
+# вместе с шаблоном уходят и все собранные по нему недели.
+# Сбросы видит только свой процесс, поэтому каждая запись и ETag привязаны ещё и
+# к состоянию БД (schedule_state): активная версия и её ревизия, счётчики
+# исключений и справочников. Правка через другой воркер меняет состояние, и
+# запись этого воркера перестаёт совпадать — одним запросом на обращение.
+# ETag строится только из состояния БД и версии выкладки, поэтому все воркеры
+# отдают для одной и той же сетки один и тот же ETag; счётчики процесса
+# (epoch, generations) нужны лишь для записи в кэш.
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .config import SCHEDULE_CACHE_SIZE, DEPLOY_VERSION
+from .models import AppMeta, ScheduleVersion
+from .refdata import DATA_VERSION_KEY
+from .weeks import EXCEPTIONS_VERSION_KEY
+
+TEMPLATES_DIR = Path(__file__).resolve().parent / "templates"
+
+
+def deploy_version():
+    # Одна на все воркеры выкладки: меняется вместе с шаблонами страниц или SCHEDULE_DEPLOY_VERSION
+    digest = hashlib.sha1(DEPLOY_VERSION.encode())
+    for path in sorted(TEMPLATES_DIR.glob("*.html")):
+        digest.update(path.name.encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:12]
+
+
+async def schedule_state(db: AsyncSession):
+    # Одна строка из скалярных подзапросов: строка есть, даже если активной версии нет
+    active = ScheduleVersion.is_active.is_(True)
+    row = (await db.execute(select(
+        select(ScheduleVersion.id).where(active).scalar_subquery(),
+        select(ScheduleVersion.revision).where(active).scalar_subquery(),
+        select(AppMeta.value).where(AppMeta.key == EXCEPTIONS_VERSION_KEY).scalar_subquery(),
+        select(AppMeta.value).where(AppMeta.key == DATA_VERSION_KEY).scalar_subquery(),
+    ))).one()
+    return tuple(row)
+
+
+class ScheduleCache:
+    def __init__(self, maxsize=SCHEDULE_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.generations = {}  # class_id -> номер поколения, растёт при каждом сбросе
+        self.epoch = 0         # растёт при полном сбросе
+        self.version = deploy_version()  # ETag не совпадёт с выданными до смены шаблонов
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key, state):
+        with self.lock:
+            stored = self.entries.get(key)
+            if stored is None or stored[0] != state:
+                # Запись, построенная при другом состоянии БД, больше не нужна
+                if stored is not None:
+                    del self.entries[key]
+                    self.invalidations += 1
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return stored[1]
+
+    def token(self, class_id, state):
+        with self.lock:
+            return self.epoch, self.generations.get(class_id, 0), state
+
+    def put(self, key, entry, token):
+        # Сетка, построенная до сброса, в кэш не попадает
+        with self.lock:
+            epoch, generation, state = token
+            if (epoch, generation) != (self.epoch, self.generations.get(key[0], 0)):
+                return
+            self.entries[key] = (state, entry)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, class_ids):
+        with self.lock:
+            class_ids = set(class_ids)
+            for key in [key for key in self.entries if key[0] in class_ids]:
+                del self.entries[key]
+                self.invalidations += 1
+            for class_id in class_ids:
+                self.generations[class_id] = self.generations.get(class_id, 0) + 1
+
+    def clear(self):
+        with self.lock:
+            self.invalidations += len(self.entries)
+            self.entries.clear()
+            self.generations.clear()
+            self.epoch += 1
+
+    def etag(self, class_id, monday, state):
+        key = f"{self.version}:{class_id}:{monday.isoformat()}:{state}"
+        return '"' + hashlib.sha1(key.encode()).hexdigest()[:16] + '"'
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+schedule_cache = ScheduleCache()
@@ -0,0 +1,54 @@
+# fast_api/conflicts.py
+# Проверка накладок одним запросом: для всех кандидатов сразу ищутся уроки
+# активной версии, занимающие тот же слот классом, кабинетом или учителем.
+# Занятость ведётся отдельно для недель А и Б: урок «каждую неделю» занимает обе.
+from sqlalchemy import select, and_, or_
+from sqlalchemy.orm import Session
+
+from .models import Lesson, ScheduleVersion
+from .occupancy import WeekOccupancy
+from .weeks import WEEK_A, WEEK_B, EVERY_WEEK, weeks_of
+
+CONFLICT_MESSAGES = {
+    "class": "У этого класса уже есть урок в это время.",
+    "room": "Этот кабинет занят.",
+    "teacher": "Учитель занят.",
+}
+
+
+def _slot_clause(lesson):
+    resources = [Lesson.class_id == lesson["class_id"], Lesson.room_id == lesson["room_id"]]
+    if lesson.get("teacher_id") is not None:
+        resources.append(Lesson.teacher_id == lesson["teacher_id"])
+    return and_(Lesson.day == lesson["day"], Lesson.lesson_number == lesson["lesson_number"], or_(*resources))
+
+
+def find_conflicts(db: Session, lessons):
+    # Возвращает {индекс кандидата: ["class", "room", ...]} — все накладки сразу
+    if not lessons:
+        return {}
+    existing = db.execute(
+        select(Lesson.class_id, Lesson.teacher_id, Lesson.room_id, Lesson.day, Lesson.lesson_number,
+               Lesson.week_parity)
+        .join(ScheduleVersion)
+        .where(ScheduleVersion.is_active.is_(True), or_(*[_slot_clause(l) for l in lessons]))
+    ).all()
+    # Накладки внутри самой пачки тоже считаются — пачка пишется в ту же занятость
+    occupancy = WeekOccupancy((WEEK_A, WEEK_B))
+    for lesson in existing:
+        occupancy.place(weeks_of(lesson.week_parity), lesson.class_id, lesson.teacher_id, lesson.room_id,
+                        lesson.day, lesson.lesson_number)
+
+    found = {}
+    for index, l in enumerate(lessons):
+        args = (weeks_of(l.get("week_parity") or EVERY_WEEK),
+                l["class_id"], l.get("teacher_id"), l["room_id"], l["day"], l["lesson_number"])
+        kinds = occupancy.conflicts(*args)
+        if kinds:
+            found[index] = kinds
+        occupancy.place(*args)
+    return found
+
+
+def describe(kinds):
+    return " ".join(CONFLICT_MESSAGES[kind] for kind in kinds)
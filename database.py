@@ -0,0 +1,75 @@
+# fast_api/database.py
+# Подключения к БД. Синхронный движок обслуживает запись и фоновые задачи.
+# Читающие маршруты работают через асинхронный движок (SQLAlchemy asyncio),
+# и число одновременных просмотров ограничено пулом соединений, а не потоками.
+# Асинхронный драйвер выбирается по URL: asyncpg для PostgreSQL, aiosqlite для
+# SQLite. Движки создаются при первом обращении, поэтому без установленного
+# драйвера приложение всё равно стартует.
+import time
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from .config import (DATABASE_URL, READ_DATABASE_URL, READ_AFTER_WRITE_SECONDS,
+                     DATABASE_POOL_SIZE, DATABASE_MAX_OVERFLOW, DATABASE_POOL_PRE_PING)
+from .metrics import count_query
+
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+_async_sessions = {}  # URL -> async_sessionmaker
+_last_write = None
+
+
+def pool_options(url):
+    options = {"pool_pre_ping": DATABASE_POOL_PRE_PING}
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=DATABASE_POOL_SIZE, max_overflow=DATABASE_MAX_OVERFLOW)
+    return options
+
+
+def async_url(url):
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or url.get_driver_name() in ("asyncpg", "aiosqlite", "psycopg_async"):
+        return url
+    return url.set(drivername=f"{url.get_backend_name()}+{driver}")
+
+
+def make_engine(url=DATABASE_URL):
+    return create_engine(url, **pool_options(url))
+
+
+def async_session_factory(url):
+    factory = _async_sessions.get(url)
+    if factory is None:
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+        engine = create_async_engine(async_url(url), **pool_options(url))
+        event.listen(engine.sync_engine, "before_cursor_execute", count_query)
+        factory = _async_sessions[url] = async_sessionmaker(engine, expire_on_commit=False)
+    return factory
+
+
+def mark_write(*args, **kwargs):
+    # Вызывается на commit основной базы и после фоновой генерации
+    global _last_write
+    _last_write = time.monotonic()
+
+
+def read_url():
+    # Сразу после записи реплика может отставать — читаем свои изменения с основной базы
+    if READ_DATABASE_URL == DATABASE_URL:
+        return DATABASE_URL
+    if _last_write is not None and time.monotonic() - _last_write < READ_AFTER_WRITE_SECONDS:
+        return DATABASE_URL
+    return READ_DATABASE_URL
+
+
+async def get_read_db():
+    async with async_session_factory(read_url())() as session:
+        yield session
+
+
+async def dispose_async_engines():
+    for factory in _async_sessions.values():
+        await factory.kw["bind"].dispose()
+    _async_sessions.clear()
@@ -0,0 +1,195 @@
+# fast_api/export.py
+# Выгрузка расписания всей школы одним потоковым запросом: JSON Lines, CSV и
+# iCalendar (по классу, учителю или кабинету, с еженедельным повтором; уроки
+# недель А/Б повторяются раз в две недели). Выгружается недельный шаблон —
+# датированные исключения в выгрузку не входят.
+# Строки читаются курсором пачками по FETCH_SIZE и сразу уходят клиенту,
+# названия берутся из снимка справочников — без запросов на каждую строку.
+import csv
+import hashlib
+import io
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .models import Lesson, ScheduleVersion
+from .weeks import EVERY_WEEK, WEEK_NAMES, week_parity
+
+EXPORT_FORMATS = {
+    "jsonl": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "ics": "text/calendar; charset=utf-8",
+}
+SCOPES = {"class": Lesson.class_id, "teacher": Lesson.teacher_id, "room": Lesson.room_id}
+FETCH_SIZE = 1000
+CHUNK_LINES = 200
+
+# Звонки: начало каждого урока, урок идёт LESSON_MINUTES минут
+BELLS = ("08:30", "09:25", "10:30", "11:35", "12:30", "13:25", "14:20", "15:15")
+LESSON_MINUTES = 45
+DAY_NAMES = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+CSV_COLUMNS = ("id", "class_id", "class_name", "day", "day_name", "lesson_number", "start", "end",
+               "subject_id", "subject_name", "teacher_id", "teacher_name", "room_id", "room_name", "week")
+
+
+def active_version_state(db: Session):
+    # Версия, ревизия и время создания активного расписания — от них зависит ETag выгрузки
+    return db.execute(
+        select(ScheduleVersion.id, ScheduleVersion.revision, ScheduleVersion.created_at)
+        .where(ScheduleVersion.is_active.is_(True))
+    ).first()
+
+
+def export_etag(state, refdata, fmt, scope=None, owner_id=None, monday=None):
+    version = f"{state.id}:{state.revision}" if state else "empty"
+    key = f"{version}:{refdata.version}:{fmt}:{scope}:{owner_id}:{monday}"
+    return '"' + hashlib.sha1(key.encode()).hexdigest()[:16] + '"'
+
+
+def owner_name(refdata, scope, owner_id):
+    if scope == "class":
+        school_class = refdata.school_class(owner_id)
+        return f"{school_class.number}{school_class.letter}" if school_class else None
+    row = refdata.teacher(owner_id) if scope == "teacher" else refdata.room(owner_id)
+    return row.name if row else None
+
+
+def lesson_times(lesson_number):
+    if not 1 <= lesson_number <= len(BELLS):
+        return None, None
+    start = datetime.strptime(BELLS[lesson_number - 1], "%H:%M")
+    return start.time(), (start + timedelta(minutes=LESSON_MINUTES)).time()
+
+
+def lesson_rows(db: Session, version_id, scope=None, owner_id=None):
+    # Один запрос по всей версии; yield_per держит в памяти не больше одной пачки
+    query = db.query(Lesson).with_entities(
+        Lesson.id, Lesson.class_id, Lesson.subject_id, Lesson.teacher_id,
+        Lesson.room_id, Lesson.day, Lesson.lesson_number, Lesson.week_parity
+    ).filter(Lesson.version_id == version_id)
+    if scope is not None:
+        query = query.filter(SCOPES[scope] == owner_id)
+    return query.order_by(Lesson.class_id, Lesson.day, Lesson.lesson_number).yield_per(FETCH_SIZE)
+
+
+def lesson_record(refdata, row):
+    school_class = refdata.school_class(row.class_id)
+    subject = refdata.subject(row.subject_id)
+    teacher = refdata.teacher(row.teacher_id)
+    room = refdata.room(row.room_id)
+    start, end = lesson_times(row.lesson_number)
+    return {
+        "id": row.id,
+        "class_id": row.class_id,
+        "class_name": f"{school_class.number}{school_class.letter}" if school_class else None,
+        "day": row.day,
+        "day_name": DAY_NAMES[row.day] if 0 <= row.day < len(DAY_NAMES) else None,
+        "lesson_number": row.lesson_number,
+        "start": start.strftime("%H:%M") if start else None,
+        "end": end.strftime("%H:%M") if end else None,
+        "subject_id": row.subject_id,
+        "subject_name": subject.name if subject else None,
+        "teacher_id": row.teacher_id,
+        "teacher_name": teacher.name if teacher else None,
+        "room_id": row.room_id,
+        "room_name": room.name if room else None,
+        "week": WEEK_NAMES.get(row.week_parity),  # None — каждую неделю
+    }
+
+
+def _chunks(lines):
+    # Отдаём по CHUNK_LINES строк: меньше мелких записей в сокет
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= CHUNK_LINES:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+def stream_jsonl(refdata, rows):
+    return _chunks(json.dumps(lesson_record(refdata, row), ensure_ascii=False) + "\n" for row in rows)
+
+
+def stream_csv(refdata, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    def lines():
+        yield line(CSV_COLUMNS)
+        for row in rows:
+            record = lesson_record(refdata, row)
+            yield line(["" if record[c] is None else record[c] for c in CSV_COLUMNS])
+
+    return _chunks(lines())
+
+
+def ics_escape(text):
+    return (text.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,").replace("\n", "\\n"))
+
+
+def ics_line(line):
+    # RFC 5545: строки длиннее 75 октетов переносятся, продолжение начинается с пробела
+    parts, current, size = [], "", 0
+    for char in line:
+        width = len(char.encode())
+        if size + width > 75:
+            parts.append(current)
+            current, size = " ", 1
+        current += char
+        size += width
+    parts.append(current)
+    return "\r\n".join(parts) + "\r\n"
+
+
+def stream_ics(refdata, rows, state, scope, owner_id, monday):
+    title = owner_name(refdata, scope, owner_id)
+    stamp = ((state.created_at if state else None) or datetime.utcnow()).strftime("%Y%m%dT%H%M%SZ")
+
+    def lines():
+        yield ics_line("BEGIN:VCALENDAR")
+        yield ics_line("VERSION:2.0")
+        yield ics_line("PRODID:-//school-timetable//export//RU")
+        yield ics_line("CALSCALE:GREGORIAN")
+        yield ics_line("X-WR-CALNAME:" + ics_escape(f"Расписание: {title}"))
+        for row in rows:
+            record = lesson_record(refdata, row)
+            start, end = lesson_times(row.lesson_number)
+            if start is None:
+                continue
+            # Первое занятие — на неделе monday (или следующей, если она другой чётности),
+            # дальше повтор каждую неделю или через неделю (время местное)
+            day = monday + timedelta(days=row.day)
+            alternate = row.week_parity != EVERY_WEEK
+            if alternate and week_parity(monday) != row.week_parity:
+                day += timedelta(weeks=1)
+            summary = record["subject_name"] or "?"
+            if scope != "class":
+                summary += f" ({record['class_name'] or '?'})"
+            yield ics_line("BEGIN:VEVENT")
+            yield ics_line(f"UID:lesson-{row.id}-v{state.id}@school-timetable")
+            yield ics_line(f"DTSTAMP:{stamp}")
+            yield ics_line(f"DTSTART:{datetime.combine(day, start):%Y%m%dT%H%M%S}")
+            yield ics_line(f"DTEND:{datetime.combine(day, end):%Y%m%dT%H%M%S}")
+            yield ics_line("RRULE:FREQ=WEEKLY;INTERVAL=2" if alternate else "RRULE:FREQ=WEEKLY")
+            yield ics_line("SUMMARY:" + ics_escape(summary))
+            if record["room_name"]:
+                yield ics_line("LOCATION:" + ics_escape(record["room_name"]))
+            if record["teacher_name"]:
+                yield ics_line("DESCRIPTION:" + ics_escape(f"Учитель: {record['teacher_name']}"))
+            yield ics_line("END:VEVENT")
+        yield ics_line("END:VCALENDAR")
+
+    return _chunks(lines())
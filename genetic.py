@@ -1,6 +1,12 @@
 import random
+from typing import NamedTuple
+
+import numpy as np
 from sqlalchemy.orm import Session
-from .models import SchoolClass, Subject, Room, Lesson, Teacher
+from .refdata import get_reference_data
+from .persist import publish_schedule
+from .occupancy import Occupancy, N_DAYS, N_SLOTS, N_TIMES, slots_mask
+from .metrics import phase, count
 
 
 SUBJECTS_BY_CLASS = {
@@ -42,137 +48,500 @@ SUBJECT_ROOMS = {
     "Химия": ["Кабинет 202 (химия)"]
 }
 
-DAYS = list(range(5))       # Пн–Пт
-SLOTS = list(range(1, 9))   # Уроки 1–8
+# Предметы только начальной школы и предметы, которые там не ведутся
+PRIMARY_GRADES = range(1, 5)
+PRIMARY_ONLY_SUBJECTS = {"Окружающий мир", "Трудовое воспитание", "ИЗО"}
+SENIOR_ONLY_SUBJECTS = {
+    "Алгебра", "Геометрия", "Физика", "Химия", "Биология", "История",
+    "Обществознание", "География", "Информатика", "ОБЖ", "Черчение",
+}
+
+DAYS = list(range(N_DAYS))          # Пн–Пт
+SLOTS = list(range(1, N_SLOTS + 1))  # Уроки 1–8
+
+# Вес жёсткого конфликта в функции оценки (окна и перегрузка дня — мягкие)
+HARD_PENALTY = 1000
+MAX_SAME_SUBJECT_PER_DAY = 2
+
+
+def generate_random_schedule(db: Session, on_progress=None, should_stop=None, curriculum=None, seed=None):
+    with phase("curriculum"):
+        curriculum = curriculum if curriculum is not None else load_curriculum(db)
+
+    # Свой генератор случайных чисел: одинаковое зерно на тех же данных — то же расписание
+    rng = random.Random(seed)
+
+    # Битовая сетка занятости классов, учителей и кабинетов
+    occupancy = Occupancy()
+    rows = []
+
+    # Учебный план по классам; порядок классов перемешиваем
+    plan_by_class = {}
+    for item in curriculum:
+        plan_by_class.setdefault(item.class_id, []).append(item)
+    class_ids = list(plan_by_class.keys())
+    rng.shuffle(class_ids)
+
+    with phase("placement"):
+        for class_id in class_ids:
+            # Равномерное распределение уроков по дням недели
+            lessons_by_day = {day: [] for day in DAYS}
+
+            # Распределяем уроки предмета по дням
+            day_index = 0
+            for item in plan_by_class[class_id]:
+                if not item.room_ids:
+                    print(f"⚠️ Пропущен предмет {item.subject_id}: нет кабинета")
+                    continue
+                for _ in range(item.hours):
+                    target_day = DAYS[day_index]
+                    lessons_by_day[target_day].append((item, rng.choice(item.room_ids)))
+                    day_index = (day_index + 1) % len(DAYS)
+
+            # Оптимизация: группируем уроки в непрерывные блоки
+            for day in DAYS:
+                daily_lessons = lessons_by_day[day]
+                if not daily_lessons:
+                    continue
+
+                # Сортируем уроки по сложности размещения
+                daily_lessons.sort(key=lambda x: len(x[0].room_ids))
+
+                # Пытаемся разместить уроки непрерывным блоком, начиная со случайной позиции
+                target_mask = slots_mask(day, range(1, len(daily_lessons) + 1))
+                anchor = rng.randint(1, len(daily_lessons))
+
+                for item, room_id in daily_lessons:
+                    # Сначала слот целевого блока, ближайший к началу, затем любой свободный слот дня
+                    found = (occupancy.nearest_free(class_id, item.teacher_id, room_id, day, anchor, target_mask)
+                             or occupancy.first_free(class_id, item.teacher_id, room_id, day))
+                    count("placements_attempted")
+                    if not found:
+                        print(f"❌ Не удалось поставить предмет {item.subject_id} для класса {class_id} в день {day}")
+                        count("unplaced")
+                        continue
+
+                    _, slot = found
+                    rows.append({
+                        "class_id": class_id,
+                        "subject_id": item.subject_id,
+                        "teacher_id": item.teacher_id,
+                        "room_id": room_id,
+                        "day": day,
+                        "lesson_number": slot,
+                    })
+                    occupancy.place(class_id, item.teacher_id, room_id, day, slot)
 
+    if should_stop and should_stop():
+        print("⏹ Генерация отменена")
+        return None
 
-def generate_random_schedule(db: Session):
-    db.query(Lesson).delete()
-    db.commit()
+    # Новая версия записывается одним массовым INSERT и активируется атомарно
+    with phase("persist"):
+        version_id = publish_schedule(db, rows, source="greedy")
+    count("lessons_placed", len(rows))
+    if on_progress:
+        on_progress(1, 0)
+    print("✅ Генерация завершена. Минимизированы окна в расписании.")
+    return version_id
 
-    classes = db.query(SchoolClass).all()
-    subjects = db.query(Subject).all()
-    rooms = db.query(Room).all()
-    teachers = db.query(Teacher).all()
 
-    class_map = {f"{cls.number}{cls.letter}": cls for cls in classes}
-    subject_map = {s.name: s for s in subjects}
-    teacher_map = {t.name: t for t in teachers}
-    room_map = {r.name: r for r in rooms}
+class CurriculumItem(NamedTuple):
+    class_id: int
+    subject_id: int
+    teacher_id: int
+    room_ids: tuple
+    hours: int
 
-    # Сетка занятости: (day, slot) -> списки занятых id
-    busy_slots = {(day, slot): {"classes": set(), "teachers": set(), "rooms": set()}
-                  for day in DAYS for slot in SLOTS}
 
-    # Оптимизация: создаем список классов и перемешиваем его
-    class_names = list(SUBJECTS_BY_CLASS.keys())
-    random.shuffle(class_names)
+def load_curriculum(db: Session):
+    # Справочники берутся из снимка процесса, без повторной загрузки из БД
+    with phase("load"):
+        refdata = get_reference_data(db)
+    class_map = refdata.class_by_name
+    subject_map = refdata.subject_by_name
+    teacher_map = refdata.teacher_by_name
+    room_map = refdata.room_by_name
 
-    for class_name in class_names:
+    curriculum = []
+    for class_name, subj_dict in SUBJECTS_BY_CLASS.items():
         if class_name not in class_map:
             print(f"⚠️ Класс {class_name} не найден")
             continue
         school_class = class_map[class_name]
-        subj_dict = SUBJECTS_BY_CLASS[class_name]
-
-        # Равномерное распределение уроков по дням недели
-        lessons_by_day = {day: [] for day in DAYS}
-        total_lessons = sum(subj_dict.values())
-        lessons_per_day = total_lessons // len(DAYS)
-        extra_lessons = total_lessons % len(DAYS)
-
-        # Распределяем уроки по дням
-        day_index = 0
-        for subj_name, count in subj_dict.items():
+        for subj_name, hours in subj_dict.items():
             subj = subject_map.get(subj_name)
             teacher = teacher_map.get(TEACHERS.get(subj_name))
-            rooms_list = [room_map[r] for r in SUBJECT_ROOMS.get(subj_name, []) if r in room_map]
-
+            rooms_list = [room_map[r].id for r in SUBJECT_ROOMS.get(subj_name, []) if r in room_map]
             if not subj or not teacher or not rooms_list:
                 print(f"⚠️ Пропущен {subj_name}: нет предмета/учителя/кабинета")
                 continue
+            curriculum.append(CurriculumItem(school_class.id, subj.id, teacher.id, tuple(rooms_list), hours))
+    return curriculum
 
-            # Распределяем уроки предмета по дням
-            for _ in range(count):
-                target_day = DAYS[day_index]
-                lessons_by_day[target_day].append((subj, teacher, random.choice(rooms_list)))
-                day_index = (day_index + 1) % len(DAYS)
-
-        # Оптимизация: группируем уроки в непрерывные блоки
-        for day in DAYS:
-            daily_lessons = lessons_by_day[day]
-            if not daily_lessons:
+
+def subject_rooms(refdata, subject_name):
+    # Явная привязка из SUBJECT_ROOMS, иначе кабинет с предметом в названии,
+    # иначе любой обычный кабинет
+    named = [refdata.room_by_name[r].id for r in SUBJECT_ROOMS.get(subject_name, []) if r in refdata.room_by_name]
+    if named:
+        return tuple(named)
+    marker = f"({subject_name.lower()})"
+    matching = [r.id for r in refdata.rooms if marker in r.name.lower()]
+    if matching:
+        return tuple(matching)
+    return tuple(r.id for r in refdata.rooms if r.name.startswith("Кабинет"))
+
+
+def build_curriculum_from_db(db: Session):
+    # Учебный план для всех классов из Subject.hours_per_week и Subject.teacher_id
+    with phase("load"):
+        refdata = get_reference_data(db)
+    curriculum = []
+    for school_class in refdata.classes:
+        primary = school_class.number in PRIMARY_GRADES
+        for subject in refdata.subjects:
+            if primary and subject.name in SENIOR_ONLY_SUBJECTS:
+                continue
+            if not primary and subject.name in PRIMARY_ONLY_SUBJECTS:
+                continue
+            if not subject.hours_per_week or subject.teacher_id is None:
                 continue
+            rooms = subject_rooms(refdata, subject.name)
+            if not rooms:
+                print(f"⚠️ Пропущен {subject.name}: нет кабинета")
+                continue
+            curriculum.append(CurriculumItem(school_class.id, subject.id, subject.teacher_id,
+                                             rooms, subject.hours_per_week))
+    return curriculum
+
 
-            # Сортируем уроки по сложности размещения
-            daily_lessons.sort(key=lambda x: len(SUBJECT_ROOMS.get(x[0].name, [])))
+# Какой учебный план строит каждый генератор (он же — источник версии расписания)
+CURRICULUM_BUILDERS = {
+    "greedy": load_curriculum,
+    "genetic": build_curriculum_from_db,
+    "islands": build_curriculum_from_db,
+    "solver": build_curriculum_from_db,
+}
 
-            # Пытаемся разместить уроки непрерывным блоком
-            target_slots = list(range(1, len(daily_lessons) + 1))
-            random.shuffle(target_slots)  # Начинаем со случайной позиции
 
-            for lesson_data in daily_lessons:
-                subj, teacher, room = lesson_data
-                placed = False
+class Problem:
+    # Плоское представление учебного плана: один элемент массива = один урок.
+    # Классы, учителя, предметы и кабинеты перенумерованы плотно (0..K-1),
+    # чтобы оценку можно было считать через np.bincount.
+    def __init__(self, curriculum):
+        items = [item for item in curriculum if item.hours > 0 and item.room_ids]
 
-                # Пробуем слоты в порядке близости к началу блока
-                for slot in sorted(target_slots, key=lambda s: abs(s - target_slots[0])):
-                    slot_key = (day, slot)
+        self.class_ids = np.array(sorted({i.class_id for i in items}), dtype=np.int64)
+        self.teacher_ids = np.array(sorted({i.teacher_id for i in items}), dtype=np.int64)
+        self.subject_ids = np.array(sorted({i.subject_id for i in items}), dtype=np.int64)
+        self.room_ids = np.array(sorted({r for i in items for r in i.room_ids}), dtype=np.int64)
 
-                    # Проверяем доступность
-                    if (school_class.id in busy_slots[slot_key]["classes"] or
-                            teacher.id in busy_slots[slot_key]["teachers"] or
-                            room.id in busy_slots[slot_key]["rooms"]):
-                        continue
+        class_index = {v: k for k, v in enumerate(self.class_ids.tolist())}
+        teacher_index = {v: k for k, v in enumerate(self.teacher_ids.tolist())}
+        subject_index = {v: k for k, v in enumerate(self.subject_ids.tolist())}
+        room_index = {v: k for k, v in enumerate(self.room_ids.tolist())}
+
+        lesson_class, lesson_teacher, lesson_subject, lesson_rank = [], [], [], []
+        lesson_rooms = []
+        per_class = {}
+        for item in items:
+            for _ in range(item.hours):
+                c = class_index[item.class_id]
+                lesson_class.append(c)
+                lesson_teacher.append(teacher_index[item.teacher_id])
+                lesson_subject.append(subject_index[item.subject_id])
+                lesson_rank.append(per_class.get(c, 0))
+                per_class[c] = per_class.get(c, 0) + 1
+                lesson_rooms.append([room_index[r] for r in item.room_ids])
+
+        self.n_lessons = len(lesson_class)
+        self.n_classes = len(self.class_ids)
+        self.n_teachers = len(self.teacher_ids)
+        self.n_subjects = len(self.subject_ids)
+        self.n_rooms = len(self.room_ids)
+
+        self.lesson_class = np.array(lesson_class, dtype=np.int64)
+        self.lesson_teacher = np.array(lesson_teacher, dtype=np.int64)
+        self.lesson_subject = np.array(lesson_subject, dtype=np.int64)
+        # Порядковый номер урока внутри класса — для начальной расстановки без накладок
+        self.lesson_rank = np.array(lesson_rank, dtype=np.int64) % N_TIMES
+
+        # Допустимые кабинеты: матрица (n_lessons, max_rooms), дополненная повтором первого
+        max_rooms = max((len(r) for r in lesson_rooms), default=1)
+        self.room_choices = np.array(
+            [r + [r[0]] * (max_rooms - len(r)) for r in lesson_rooms], dtype=np.int64
+        ).reshape(self.n_lessons, max_rooms)
+        self.room_counts = np.array([len(r) for r in lesson_rooms], dtype=np.int64)
+
+
+class GeneticScheduler:
+    # Хромосома — массив (n_lessons, 3): день, номер урока (0..7) и кабинет (плотный индекс).
+    # Популяция хранится одним массивом (population_size, n_lessons, 3).
+    def __init__(self, problem: Problem, population_size=200, elite=4, tournament=3,
+                 mutation_rate=0.01, conflict_mutation_rate=0.3, candidates=8, max_mutations=8,
+                 seed=None, population=None):
+        self.problem = problem
+        self.population_size = population_size
+        self.elite = min(elite, population_size)
+        self.tournament = tournament
+        self.mutation_rate = mutation_rate
+        self.conflict_mutation_rate = conflict_mutation_rate
+        self.candidates = candidates
+        self.max_mutations = max_mutations
+        self.rng = np.random.default_rng(seed)
+        self.generation = 0
+
+        if population is None:
+            population = self.random_population(population_size)
+        self.population = population
+        self.scores = self.evaluate(self.population)
+
+    def random_population(self, size):
+        p = self.problem
+        # Каждый класс получает случайную перестановку 40 позиций недели,
+        # поэтому в начальной популяции у классов нет накладок
+        perms = np.argsort(self.rng.random((size, max(p.n_classes, 1), N_TIMES)), axis=-1)
+        times = perms[:, p.lesson_class, p.lesson_rank]
+
+        population = np.empty((size, p.n_lessons, 3), dtype=np.int64)
+        population[..., 0] = times // N_SLOTS
+        population[..., 1] = times % N_SLOTS
+        population[..., 2] = self.random_rooms(size)
+        return population
+
+    def random_rooms(self, size):
+        p = self.problem
+        pick = self.rng.integers(0, 1 << 30, size=(size, p.n_lessons)) % p.room_counts
+        return p.room_choices[np.arange(p.n_lessons), pick]
+
+    def _counts(self, keys, n_keys):
+        # Сколько уроков попало в каждый ключ — для всех особей сразу
+        size = keys.shape[0]
+        offsets = (np.arange(size, dtype=np.int64) * n_keys)[:, None]
+        counts = np.bincount((keys + offsets).ravel(), minlength=size * n_keys)
+        return counts.reshape(size, n_keys)
+
+    def _occupancy(self, population):
+        p = self.problem
+        times = population[..., 0] * N_SLOTS + population[..., 1]
+        class_keys = p.lesson_class * N_TIMES + times
+        teacher_keys = p.lesson_teacher * N_TIMES + times
+        room_keys = population[..., 2] * N_TIMES + times
+        return (
+            (class_keys, self._counts(class_keys, p.n_classes * N_TIMES)),
+            (teacher_keys, self._counts(teacher_keys, p.n_teachers * N_TIMES)),
+            (room_keys, self._counts(room_keys, max(p.n_rooms, 1) * N_TIMES)),
+        )
+
+    def evaluate(self, population):
+        p = self.problem
+        size = population.shape[0]
+        (class_keys, class_counts), (teacher_keys, teacher_counts), (room_keys, room_counts) = \
+            self._occupancy(population)
+
+        clashes = (np.maximum(class_counts - 1, 0).sum(axis=1)
+                   + np.maximum(teacher_counts - 1, 0).sum(axis=1)
+                   + np.maximum(room_counts - 1, 0).sum(axis=1))
+
+        # Окна: внутри дня класса считаем пустые слоты между первым и последним уроком
+        occupied = (class_counts > 0).reshape(size, p.n_classes, N_DAYS, N_SLOTS)
+        busy = occupied.sum(axis=-1)
+        first = occupied.argmax(axis=-1)
+        last = N_SLOTS - 1 - occupied[..., ::-1].argmax(axis=-1)
+        windows = np.where(busy > 0, last - first + 1 - busy, 0).sum(axis=(1, 2))
+
+        # Перегрузка дня одним предметом
+        subject_keys = (p.lesson_class * p.n_subjects + p.lesson_subject) * N_DAYS + population[..., 0]
+        subject_counts = self._counts(subject_keys, p.n_classes * p.n_subjects * N_DAYS)
+        overload = np.maximum(subject_counts - MAX_SAME_SUBJECT_PER_DAY, 0).sum(axis=1)
+
+        return HARD_PENALTY * clashes + windows + overload
+
+    def select(self, count):
+        contenders = self.rng.integers(0, self.population_size, size=(count, self.tournament))
+        best = self.scores[contenders].argmin(axis=1)
+        return contenders[np.arange(count), best]
+
+    def crossover(self, parents_a, parents_b):
+        # Скрещивание блоками классов: все уроки класса берутся от одного родителя,
+        # поэтому перестановка слотов класса не разрушается и накладок класса не появляется
+        p = self.problem
+        mask = self.rng.random((parents_a.shape[0], max(p.n_classes, 1))) < 0.5
+        return np.where(mask[:, p.lesson_class, None], parents_a, parents_b)
+
+    def mutate(self, children):
+        p = self.problem
+        size = children.shape[0]
+        rows_all = np.arange(size)[:, None]
+        times = children[..., 0] * N_SLOTS + children[..., 1]
+        class_keys = p.lesson_class * N_TIMES + times
+        teacher_keys = p.lesson_teacher * N_TIMES + times
+        room_keys = children[..., 2] * N_TIMES + times
+        teacher_counts = self._counts(teacher_keys, p.n_teachers * N_TIMES)
+        room_counts = self._counts(room_keys, max(p.n_rooms, 1) * N_TIMES)
+        # Какой урок стоит в слоте класса (-1 — свободно): мутация меняет уроки класса местами
+        class_slot = np.full((size, p.n_classes * N_TIMES), -1, dtype=np.int64)
+        class_slot[rows_all, class_keys] = np.arange(p.n_lessons)
+
+        # Уроки с накладкой мутируют гораздо чаще остальных
+        conflicts = ((np.take_along_axis(teacher_counts, teacher_keys, axis=1) > 1)
+                     | (np.take_along_axis(room_counts, room_keys, axis=1) > 1))
+        rates = np.where(conflicts, self.conflict_mutation_rate, self.mutation_rate)
+        pi, li = np.nonzero(self.rng.random(rates.shape) < rates)
+        if not len(li):
+            return children
+        # Мутации одной особи применяются по очереди, и занятость пересчитывается после каждой —
+        # иначе несколько уроков особи попадают в один «свободный» слот. За раунд — по одной
+        # мутации в каждой особи, все особи обрабатываются вместе. Порядок внутри особи
+        # случайный, и раундов не больше max_mutations
+        order = np.lexsort((self.rng.random(len(pi)), pi))
+        pi, li = pi[order], li[order]
+        rank = np.arange(len(pi)) - np.searchsorted(pi, pi)
+        k = self.candidates
+        for r in range(min(int(rank.max()) + 1, self.max_mutations)):
+            sel = rank == r
+            self._swap_round(children, pi[sel], li[sel], class_slot, teacher_counts, room_counts, k)
+        return children
+
+    def _swap_round(self, children, pi, li, class_slot, teacher_counts, room_counts, k):
+        # Урок i переходит в случайный слот t своего класса (с новым кабинетом), а стоявший
+        # там урок j того же класса — на старое место i. Из k кандидатов берётся первый,
+        # где учителя и кабинеты обоих уроков свободны; если такого нет — первый кандидат
+        p = self.problem
+        n = len(li)
+        rows = pi[:, None]
+        old = (children[pi, li, 0] * N_SLOTS + children[pi, li, 1])[:, None]
+        old_room = children[pi, li, 2][:, None]
+        teacher_i = p.lesson_teacher[li][:, None]
+        class_base = (p.lesson_class[li] * N_TIMES)[:, None]
+
+        cand_times = self.rng.integers(0, N_TIMES, size=(n, k))
+        pick = self.rng.integers(0, 1 << 30, size=(n, k)) % p.room_counts[li, None]
+        cand_rooms = p.room_choices[li[:, None], pick]
+        j = class_slot[rows, class_base + cand_times]
+        has_j = j >= 0
+        j_safe = np.where(has_j, j, 0)
+        teacher_j = p.lesson_teacher[j_safe]
+        room_j = children[rows, j_safe, 2]
+
+        # Занятость в слоте t без урока j (он уходит) и в старом слоте без урока i
+        teacher_busy_t = (teacher_counts[rows, teacher_i * N_TIMES + cand_times]
+                          - (has_j & (teacher_j == teacher_i)))
+        room_busy_t = room_counts[rows, cand_rooms * N_TIMES + cand_times] - (has_j & (room_j == cand_rooms))
+        teacher_busy_old = teacher_counts[rows, teacher_j * N_TIMES + old] - (teacher_j == teacher_i)
+        room_busy_old = room_counts[rows, room_j * N_TIMES + old] - (room_j == old_room)
+        good = ((cand_times != old) & (teacher_busy_t == 0) & (room_busy_t == 0)
+                & (~has_j | ((teacher_busy_old == 0) & (room_busy_old == 0))))
+        choice = good.argmax(axis=-1)[:, None]
+        t = np.take_along_axis(cand_times, choice, axis=-1)[:, 0]
+        room_i = np.take_along_axis(cand_rooms, choice, axis=-1)[:, 0]
+        j = np.take_along_axis(j, choice, axis=-1)[:, 0]
+        old, old_room, teacher_i, class_base = old[:, 0], old_room[:, 0], teacher_i[:, 0], class_base[:, 0]
+        keep = t != old
+        pi, li, t, room_i, j, old, old_room, teacher_i, class_base = (
+            a[keep] for a in (pi, li, t, room_i, j, old, old_room, teacher_i, class_base))
+
+        # Снимаем оба урока со старых мест и ставим на новые
+        np.add.at(teacher_counts, (pi, teacher_i * N_TIMES + old), -1)
+        np.add.at(room_counts, (pi, old_room * N_TIMES + old), -1)
+        np.add.at(teacher_counts, (pi, teacher_i * N_TIMES + t), 1)
+        np.add.at(room_counts, (pi, room_i * N_TIMES + t), 1)
+        children[pi, li, 0], children[pi, li, 1], children[pi, li, 2] = t // N_SLOTS, t % N_SLOTS, room_i
+        class_slot[pi, class_base + t] = li
+        class_slot[pi, class_base + old] = -1
+
+        moved = j >= 0
+        pj, jj, tj, t_from = pi[moved], j[moved], old[moved], t[moved]
+        teacher_jj = p.lesson_teacher[jj]
+        room_jj = children[pj, jj, 2]
+        np.add.at(teacher_counts, (pj, teacher_jj * N_TIMES + t_from), -1)
+        np.add.at(room_counts, (pj, room_jj * N_TIMES + t_from), -1)
+        np.add.at(teacher_counts, (pj, teacher_jj * N_TIMES + tj), 1)
+        np.add.at(room_counts, (pj, room_jj * N_TIMES + tj), 1)
+        children[pj, jj, 0], children[pj, jj, 1] = tj // N_SLOTS, tj % N_SLOTS
+        class_slot[pj, class_base[moved] + tj] = jj
+
+    def step(self):
+        order = np.argsort(self.scores, kind="stable")
+        elite = self.population[order[:self.elite]]
+
+        n_children = self.population_size - self.elite
+        parents_a = self.select(n_children)
+        parents_b = self.select(n_children)
+        children = self.crossover(self.population[parents_a], self.population[parents_b])
+        children = self.mutate(children)
+
+        self.population = np.concatenate([elite, children])
+        self.scores = self.evaluate(self.population)
+        self.generation += 1
+
+    def best(self):
+        i = int(self.scores.argmin())
+        return self.population[i].copy(), int(self.scores[i])
+
+    def run(self, generations, on_progress=None, should_stop=None):
+        best_score = None
+        for _ in range(generations):
+            score = int(self.scores.min())
+            if on_progress and (best_score is None or score < best_score):
+                on_progress(self.generation, score)
+            best_score = score if best_score is None else min(best_score, score)
+            if score == 0 or (should_stop and should_stop()):
+                break
+            self.step()
+        return self.best()
+
+
+def decode_chromosome(problem: Problem, chromosome):
+    # Переводит хромосому в строки таблицы schedule. Уроки с накладкой не записываются.
+    rows = []
+    unplaced = 0
+    occupancy = Occupancy()
+    for i in range(problem.n_lessons):
+        day, slot, room = (int(v) for v in chromosome[i])
+        class_id = int(problem.class_ids[problem.lesson_class[i]])
+        teacher_id = int(problem.teacher_ids[problem.lesson_teacher[i]])
+        room_id = int(problem.room_ids[room])
+        if not occupancy.is_free(class_id, teacher_id, room_id, day, slot + 1):
+            unplaced += 1
+            continue
+        occupancy.place(class_id, teacher_id, room_id, day, slot + 1)
+        rows.append({
+            "class_id": class_id,
+            "subject_id": int(problem.subject_ids[problem.lesson_subject[i]]),
+            "teacher_id": teacher_id,
+            "room_id": room_id,
+            "day": day,
+            "lesson_number": slot + 1,
+        })
+    return rows, unplaced
+
+
+def generate_genetic_schedule(db: Session, population_size=200, generations=500, seed=None,
+                              on_progress=None, should_stop=None, curriculum=None):
+    with phase("curriculum"):
+        problem = Problem(curriculum if curriculum is not None else build_curriculum_from_db(db))
+    if problem.n_lessons == 0:
+        print("⚠️ Учебный план пуст — нечего генерировать")
+        return None
+
+    with phase("optimisation"):
+        engine = GeneticScheduler(problem, population_size=population_size, seed=seed)
+        chromosome, score = engine.run(generations, on_progress=on_progress, should_stop=should_stop)
+    count("generations", engine.generation)
+    if should_stop and should_stop():
+        print("⏹ Генерация отменена")
+        return None
+    with phase("placement"):
+        rows, unplaced = decode_chromosome(problem, chromosome)
+    count("lessons_placed", len(rows))
+    count("unplaced", unplaced)
+
+    with phase("persist"):
+        version_id = publish_schedule(db, rows, source="genetic")
 
-                    # Нашли свободный слот - размещаем урок
-                    db.add(Lesson(
-                        class_id=school_class.id,
-                        subject_id=subj.id,
-                        teacher_id=teacher.id,
-                        room_id=room.id,
-                        day=day,
-                        lesson_number=slot
-                    ))
-
-                    # Обновляем информацию о занятости
-                    busy_slots[slot_key]["classes"].add(school_class.id)
-                    busy_slots[slot_key]["teachers"].add(teacher.id)
-                    busy_slots[slot_key]["rooms"].add(room.id)
-
-                    # Убираем использованный слот из целевых
-                    if slot in target_slots:
-                        target_slots.remove(slot)
-
-                    placed = True
-                    break
-
-                if not placed:
-                    # Если не удалось разместить в целевом блоке, ищем любой свободный слот
-                    for slot in SLOTS:
-                        slot_key = (day, slot)
-                        if (school_class.id in busy_slots[slot_key]["classes"] or
-                                teacher.id in busy_slots[slot_key]["teachers"] or
-                                room.id in busy_slots[slot_key]["rooms"]):
-                            continue
-
-                        db.add(Lesson(
-                            class_id=school_class.id,
-                            subject_id=subj.id,
-                            teacher_id=teacher.id,
-                            room_id=room.id,
-                            day=day,
-                            lesson_number=slot
-                        ))
-
-                        busy_slots[slot_key]["classes"].add(school_class.id)
-                        busy_slots[slot_key]["teachers"].add(teacher.id)
-                        busy_slots[slot_key]["rooms"].add(room.id)
-                        placed = True
-                        break
-
-                    if not placed:
-                        print(f"❌ Не удалось поставить {subj.name} для {class_name} в день {day}")
-
-    db.commit()
-    print("✅ Генерация завершена. Минимизированы окна в расписании.")
\ No newline at end of file
+    if unplaced:
+        print(f"❌ Не удалось поставить {unplaced} уроков без накладок")
+    print(f"✅ Генетический алгоритм: поколение {engine.generation}, оценка {score}.")
+    return version_id
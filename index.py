@@ -0,0 +1,129 @@
+# fast_api/index.py
+# Обратный индекс активного расписания в памяти процесса: класс, учитель и
+# кабинет → сетка 5×8 уроков, плюс битовые маски занятости для поиска свободных
+# кабинетов. Индекс строится одним запросом на версию расписания и дальше
+# обновляется точечно при добавлении и удалении уроков. Если ревизия версии в БД
+# ушла вперёд не через этот процесс (ремонт, оптимизация, другой воркер),
+# индекс перестраивается при следующем обращении. Сетки показывают недельный
+# шаблон; правка уроков недель А/Б тоже ведёт к перестройке, а не к точечному
+# обновлению — снять бит занятости, не зная о парном уроке, нельзя.
+import threading
+from typing import NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from .models import Lesson
+from .export import active_version_state
+from .occupancy import Occupancy, N_DAYS, N_SLOTS, slot_bit
+from .weeks import EVERY_WEEK
+
+KINDS = ("class", "teacher", "room")
+
+
+class IndexedLesson(NamedTuple):
+    class_id: int
+    subject_id: int
+    teacher_id: Optional[int]
+    room_id: int
+    day: int
+    lesson_number: int
+    week_parity: int = EVERY_WEEK
+
+
+def empty_grid():
+    return [[None] * N_SLOTS for _ in range(N_DAYS)]
+
+
+class TimetableIndex:
+    def __init__(self):
+        self.key = None  # (version_id, revision), для которых построен индекс
+        self.grids = {kind: {} for kind in KINDS}
+        self.occupancy = Occupancy()
+        self.lock = threading.Lock()
+        self.builds = 0
+
+    @staticmethod
+    def _owners(lesson):
+        return (("class", lesson.class_id), ("teacher", lesson.teacher_id), ("room", lesson.room_id))
+
+    def _insert(self, lesson, grids=None, occupancy=None):
+        grids = grids if grids is not None else self.grids
+        occupancy = occupancy if occupancy is not None else self.occupancy
+        if not (0 <= lesson.day < N_DAYS and 1 <= lesson.lesson_number <= N_SLOTS):
+            return
+        for kind, owner_id in self._owners(lesson):
+            if owner_id is None:
+                continue
+            grid = grids[kind].get(owner_id)
+            if grid is None:
+                grid = grids[kind][owner_id] = empty_grid()
+            grid[lesson.day][lesson.lesson_number - 1] = lesson
+        occupancy.place(lesson.class_id, lesson.teacher_id, lesson.room_id, lesson.day, lesson.lesson_number)
+
+    def _delete(self, lesson):
+        if not (0 <= lesson.day < N_DAYS and 1 <= lesson.lesson_number <= N_SLOTS):
+            return
+        for kind, owner_id in self._owners(lesson):
+            grid = self.grids[kind].get(owner_id)
+            if grid is not None and grid[lesson.day][lesson.lesson_number - 1] == lesson:
+                grid[lesson.day][lesson.lesson_number - 1] = None
+        self.occupancy.remove(lesson.class_id, lesson.teacher_id, lesson.room_id, lesson.day, lesson.lesson_number)
+
+    def _build(self, db: Session, key):
+        # Новый индекс собирается целиком и подменяет старый одним присваиванием
+        grids = {kind: {} for kind in KINDS}
+        occupancy = Occupancy()
+        if key is not None:
+            rows = db.query(Lesson).with_entities(
+                Lesson.class_id, Lesson.subject_id, Lesson.teacher_id,
+                Lesson.room_id, Lesson.day, Lesson.lesson_number, Lesson.week_parity
+            ).filter(Lesson.version_id == key[0]).all()
+            for row in rows:
+                self._insert(IndexedLesson(*row), grids, occupancy)
+        self.grids, self.occupancy, self.key = grids, occupancy, key
+        self.builds += 1
+
+    def refresh(self, db: Session):
+        # Одна выборка по первичному ключу версии; перестройка — только если версия сменилась
+        state = active_version_state(db)
+        key = (state.id, state.revision) if state else None
+        if key != self.key:
+            with self.lock:
+                if key != self.key:
+                    self._build(db, key)
+        return self
+
+    def apply(self, version_id, revision, added=(), removed=()):
+        # Вызывается после commit правки этого процесса: если до неё индекс был актуален,
+        # изменения применяются на месте, иначе индекс помечается устаревшим.
+        # Строки — словари с полями IndexedLesson (как у LessonIn и формы добавления)
+        with self.lock:
+            removed = [IndexedLesson(**row) for row in removed]
+            added = [IndexedLesson(**row) for row in added]
+            if (self.key != (version_id, revision - 1)
+                    or any(row.week_parity != EVERY_WEEK for row in removed + added)):
+                self.key = None
+                return
+            for row in removed:
+                self._delete(row)
+            for row in added:
+                self._insert(row)
+            self.key = (version_id, revision)
+
+    def grid(self, kind, owner_id):
+        grid = self.grids[kind].get(owner_id)
+        return [list(day) for day in grid] if grid is not None else empty_grid()
+
+    def free_rooms(self, refdata, day, slot):
+        bit = slot_bit(day, slot)
+        return [room for room in refdata.rooms if not self.occupancy.room_mask(room.id) & bit]
+
+    def stats(self):
+        return {
+            "key": self.key,
+            "builds": self.builds,
+            **{kind: len(grids) for kind, grids in self.grids.items()},
+        }
+
+
+timetable_index = TimetableIndex()
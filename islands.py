@@ -0,0 +1,87 @@
+# fast_api/islands.py
+# Островная модель: несколько независимых популяций ГА в пуле процессов,
+# которые раз в эпоху обмениваются лучшими расписаниями (кольцевая миграция).
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from .config import GENERATION_WORKERS
+from .genetic import Problem, GeneticScheduler, build_curriculum_from_db, decode_chromosome
+from .persist import publish_schedule
+from .metrics import phase, count
+
+
+def evolve_island(problem: Problem, population, migrants, seed, generations, population_size):
+    engine = GeneticScheduler(problem, population_size=population_size, seed=seed, population=population)
+    if migrants is not None and len(migrants):
+        # Мигранты замещают худших особей острова
+        worst = np.argsort(engine.scores)[-len(migrants):]
+        engine.population[worst] = migrants
+        engine.scores = engine.evaluate(engine.population)
+    engine.run(generations)
+    return engine.population, engine.scores, engine.generation
+
+
+def generate_island_schedule(db: Session, workers=None, population_size=200, generations=500,
+                             epoch=25, migrants=2, seed=None, on_progress=None, should_stop=None,
+                             curriculum=None):
+    workers = workers or GENERATION_WORKERS
+    with phase("curriculum"):
+        problem = Problem(curriculum if curriculum is not None else build_curriculum_from_db(db))
+    if problem.n_lessons == 0:
+        print("⚠️ Учебный план пуст — нечего генерировать")
+        return None
+
+    # У каждого острова своё зерно, производное от общего
+    base_seed = seed if seed is not None else int(np.random.SeedSequence().entropy % (1 << 32))
+    populations = [None] * workers
+    incoming = [None] * workers
+    best, best_score = None, None
+    total_generations = 0
+
+    with phase("optimisation"), ProcessPoolExecutor(max_workers=workers) as pool:
+        for round_no in range(max(1, -(-generations // epoch))):
+            futures = [
+                pool.submit(evolve_island, problem, populations[i], incoming[i],
+                            [base_seed, i, round_no], epoch, population_size)
+                for i in range(workers)
+            ]
+            results = [f.result() for f in futures]
+
+            improved = False
+            for i, (population, scores, _) in enumerate(results):
+                populations[i] = population
+                j = int(scores.argmin())
+                if best_score is None or scores[j] < best_score:
+                    best, best_score = population[j].copy(), int(scores[j])
+                    improved = True
+            total_generations += epoch
+            if on_progress and improved:
+                on_progress(total_generations, best_score)
+
+            if best_score == 0 or (should_stop and should_stop()):
+                break
+
+            # Кольцо: остров i получает лучших особей острова i-1
+            incoming = [
+                populations[i - 1][np.argsort(results[i - 1][1])[:migrants]]
+                for i in range(workers)
+            ]
+    count("generations", total_generations)
+
+    if should_stop and should_stop():
+        print("⏹ Генерация отменена")
+        return None
+
+    with phase("placement"):
+        rows, unplaced = decode_chromosome(problem, best)
+    count("lessons_placed", len(rows))
+    count("unplaced", unplaced)
+    with phase("persist"):
+        version_id = publish_schedule(db, rows, source="islands")
+
+    if unplaced:
+        print(f"❌ Не удалось поставить {unplaced} уроков без накладок")
+    print(f"✅ Островная модель ({workers} процессов): ~{total_generations} поколений, оценка {best_score}.")
+    return version_id
@@ -0,0 +1,287 @@
+# fast_api/jobs.py
+# Фоновые задачи генерации: генератор работает в отдельном процессе,
+# а веб-процесс получает от него прогресс через очередь и хранит состояние задачи.
+# «Одна генерация на школу» держится в БД: арендой в app_meta, которую задача
+# продлевает, пока идёт, — так её видят все воркеры. Аренда истекает сама,
+# если воркер упал, не сняв её.
+import asyncio
+import multiprocessing as mp
+import queue as queue_module
+import threading
+import time
+import uuid
+
+from sqlalchemy import select, insert, update, delete
+from sqlalchemy.exc import IntegrityError
+
+from .metrics import metrics
+from .models import AppMeta
+
+DEFAULT_SCHOOL = "default"  # пока одна школа на базу данных
+CANCEL_GRACE_SECONDS = 10
+LOCK_TTL_SECONDS = 60
+LOCK_RENEW_SECONDS = 15
+EVENTS_POLL_SECONDS = 0.25
+FINAL_EVENTS = ("done", "failed", "cancelled")  # после них генератор ничего не шлёт
+
+
+class JobConflict(Exception):
+    pass
+
+
+def _lock_key(school):
+    return f"generation_lock:{school}"
+
+
+def acquire_lock(db, school, job_id):
+    # Возвращает None, если аренда получена, иначе id задачи, которая её держит
+    key = _lock_key(school)
+    value = f"{job_id}:{time.time() + LOCK_TTL_SECONDS}"
+    current = db.execute(select(AppMeta.value).where(AppMeta.key == key)).scalar()
+    try:
+        if current is None:
+            db.execute(insert(AppMeta).values(key=key, value=value))
+        else:
+            holder, expires = current.rsplit(":", 1)
+            if float(expires) > time.time():
+                return holder
+            # Просроченная аренда: забираем, только если её не успел забрать другой воркер
+            if not db.execute(update(AppMeta).where(AppMeta.key == key, AppMeta.value == current)
+                              .values(value=value)).rowcount:
+                db.rollback()
+                return db.execute(select(AppMeta.value).where(AppMeta.key == key)).scalar().rsplit(":", 1)[0]
+        db.commit()
+    except IntegrityError:
+        # Другой воркер вставил аренду одновременно с нами
+        db.rollback()
+        return db.execute(select(AppMeta.value).where(AppMeta.key == key)).scalar().rsplit(":", 1)[0]
+    return None
+
+
+def renew_lock(db, school, job_id):
+    db.execute(update(AppMeta).where(AppMeta.key == _lock_key(school), AppMeta.value.startswith(f"{job_id}:"))
+               .values(value=f"{job_id}:{time.time() + LOCK_TTL_SECONDS}"))
+    db.commit()
+
+
+def release_lock(db, school, job_id):
+    db.execute(delete(AppMeta).where(AppMeta.key == _lock_key(school), AppMeta.value.startswith(f"{job_id}:")))
+    db.commit()
+
+
+def _run_generator(mode, params, events, cancel):
+    # Точка входа дочернего процесса: своё подключение к БД, свои импорты
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from .config import DATABASE_URL
+    from .genetic import generate_random_schedule, generate_genetic_schedule
+    from .islands import generate_island_schedule
+    from .solver import generate_solver_schedule
+    from .localsearch import optimize_schedule
+    from .metrics import generation_run
+    from .memo import CURRICULUM_BUILDERS, generate_cached
+
+    generators = {
+        "greedy": generate_random_schedule,
+        "genetic": generate_genetic_schedule,
+        "islands": generate_island_schedule,
+        "solver": generate_solver_schedule,
+        "optimize": optimize_schedule,
+    }
+    started = time.monotonic()
+
+    def on_progress(generation, best_score):
+        events.put({"type": "progress", "generation": generation, "best_score": best_score,
+                    "elapsed": round(time.monotonic() - started, 3)})
+
+    params = dict(params)
+    profile = params.pop("profile", False)
+    engine = create_engine(DATABASE_URL)
+    db = sessionmaker(bind=engine)()
+    try:
+        # Фазы и счётчики прогона уходят в веб-процесс вместе с итоговым событием
+        with generation_run(mode, profile=profile) as run:
+            if mode in CURRICULUM_BUILDERS:
+                # Генераторы с учебным планом на входе идут через кэш результатов
+                version_id = generate_cached(db, mode, generators[mode], on_progress=on_progress,
+                                             should_stop=cancel.is_set, **params)
+            else:
+                params.pop("warm", None)  # тёплый старт имеет смысл только для генераторов
+                version_id = generators[mode](db, on_progress=on_progress, should_stop=cancel.is_set, **params)
+        report = {"metrics": run.summary(), "profile": run.profile}
+        if cancel.is_set():
+            events.put(dict(report, type="cancelled"))
+        else:
+            events.put(dict(report, type="done", version_id=version_id))
+    except Exception as exc:
+        events.put({"type": "failed", "error": repr(exc)})
+    finally:
+        db.close()
+        engine.dispose()
+
+
+class Job:
+    def __init__(self, school, mode):
+        self.id = uuid.uuid4().hex
+        self.school = school
+        self.mode = mode
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at = None
+        self.generation = 0
+        self.best_score = None
+        self.version_id = None
+        self.error = None
+        self.metrics = None  # фазы и счётчики прогона
+        self.profile = None  # отчёт cProfile, если запрошен
+        self.events = []  # история сообщений для SSE
+        self.changed = threading.Condition()
+
+    @property
+    def finished(self):
+        return self.status != "running"
+
+    def to_dict(self):
+        end = self.finished_at or time.time()
+        return {
+            "id": self.id,
+            "school": self.school,
+            "mode": self.mode,
+            "status": self.status,
+            "generation": self.generation,
+            "best_score": self.best_score,
+            "elapsed": round(end - self.started_at, 3),
+            "version_id": self.version_id,
+            "error": self.error,
+            "metrics": self.metrics,
+        }
+
+
+class JobManager:
+    def __init__(self):
+        self.jobs = {}
+        self.running = {}  # школа -> id активной задачи
+        self.lock = threading.Lock()
+        self.context = mp.get_context("spawn")
+        self.listeners = []  # вызываются в веб-процессе после успешной генерации
+        self.session_factory = None  # sessionmaker основной БД — для аренды; без него только свой процесс
+
+    def _with_db(self, action, *args):
+        if self.session_factory is None:
+            return None
+        db = self.session_factory()
+        try:
+            return action(db, *args)
+        finally:
+            db.close()
+
+    def start(self, mode, params=None, school=DEFAULT_SCHOOL):
+        with self.lock:
+            current = self.running.get(school)
+            if current is not None and not self.jobs[current].finished:
+                raise JobConflict(current)
+            job = Job(school, mode)
+            # Задачи других воркеров видны только через аренду в БД
+            holder = self._with_db(acquire_lock, school, job.id)
+            if holder is not None:
+                raise JobConflict(holder)
+            self.jobs[job.id] = job
+            self.running[school] = job.id
+
+        events = self.context.Queue()
+        cancel = self.context.Event()
+        # Не daemon: островной режим сам запускает пул процессов
+        process = self.context.Process(target=_run_generator, args=(mode, params or {}, events, cancel))
+        process.start()
+        job.process, job.cancel_event = process, cancel
+
+        threading.Thread(target=self._watch, args=(job, process, events, cancel), daemon=True).start()
+        return job
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.cancel_event.set()
+        return job
+
+    def _record(self, job, message):
+        with job.changed:
+            kind = message["type"]
+            if kind == "progress":
+                job.generation = message["generation"]
+                job.best_score = message["best_score"]
+            elif kind == "done":
+                job.version_id = message["version_id"]
+                job.status = "done"
+            elif kind == "failed":
+                job.error = message["error"]
+                job.status = "failed"
+            elif kind == "cancelled":
+                job.status = "cancelled"
+            if message.get("metrics"):
+                job.metrics = message["metrics"]
+                metrics.record_run(job.metrics, job.status)
+            if message.get("profile"):
+                job.profile = message.pop("profile")
+            if job.finished and job.finished_at is None:
+                job.finished_at = time.time()
+            job.events.append(dict(message, **job.to_dict()))
+            job.changed.notify_all()
+
+    def _watch(self, job, process, events, cancel):
+        # Итог публикуется последним: кто увидел его по SSE, может сразу запускать
+        # следующую генерацию и читает уже сброшенный кэш
+        try:
+            final = self._follow(job, process, events, cancel)
+        finally:
+            self._with_db(release_lock, job.school, job.id)
+        if final["type"] == "done":
+            for listener in self.listeners:
+                listener(job)
+        self._record(job, final)
+
+    def _follow(self, job, process, events, cancel):
+        # Передаёт в задачу промежуточные события и возвращает итоговое
+        cancelled_at = None
+        renewed_at = time.monotonic()
+        final = None
+        while final is None:
+            if time.monotonic() - renewed_at > LOCK_RENEW_SECONDS:
+                self._with_db(renew_lock, job.school, job.id)
+                renewed_at = time.monotonic()
+            try:
+                message = events.get(timeout=0.5)
+            except queue_module.Empty:
+                if not process.is_alive():
+                    break
+                # Генератор не откликнулся на отмену — завершаем процесс
+                if cancel.is_set():
+                    cancelled_at = cancelled_at or time.monotonic()
+                    if time.monotonic() - cancelled_at > CANCEL_GRACE_SECONDS:
+                        process.terminate()
+                continue
+            if message["type"] in FINAL_EVENTS:
+                final = message
+            else:
+                self._record(job, message)
+        process.join()
+        if final is None:
+            final = ({"type": "cancelled"} if cancel.is_set()
+                     else {"type": "failed", "error": f"exit code {process.exitcode}"})
+        return final
+
+    async def wait_events(self, job, after, timeout=15.0):
+        # Ждёт событий с номером >= after (для SSE), не занимая поток пула
+        deadline = time.monotonic() + timeout
+        while True:
+            with job.changed:
+                if len(job.events) > after or job.finished or time.monotonic() >= deadline:
+                    return job.events[after:]
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+
+
+jobs = JobManager()
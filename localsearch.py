@@ -0,0 +1,240 @@
+# fast_api/localsearch.py
+# Доводка готового расписания имитацией отжига: ходы «перенести урок» и
+# «поменять местами два урока класса». Накладки не допускаются никогда, а
+# стоимость хода (окна классов и учителей) считается как O(1)-дельта по
+# битам затронутых дней в сетке занятости — без пересчёта всего расписания.
+# Работает с любым стартовым расписанием, в том числе отредактированным вручную.
+# Занятость ведётся по неделям А и Б: пара уроков А/Б в одном слоте — не накладка,
+# а окна считаются в обеих неделях.
+import math
+import random
+import time
+
+from sqlalchemy.orm import Session
+
+from .genetic import subject_rooms
+from .models import Lesson
+from .occupancy import WeekOccupancy, N_DAYS, N_SLOTS, day_windows
+from .persist import active_lessons, move_lessons, touch_version
+from .refdata import get_reference_data
+from .weeks import WEEK_A, WEEK_B, weeks_of
+from .metrics import phase, count
+
+CLASS_WINDOW_WEIGHT = 2
+TEACHER_WINDOW_WEIGHT = 1
+DAY_MASK = (1 << N_SLOTS) - 1
+WEEKS = ((WEEK_A,), (WEEK_B,))
+
+
+class LocalSearch:
+    def __init__(self, lessons, room_options, seed=None, t_start=2.0, t_end=0.02):
+        # lessons — список (class_id, teacher_id, room_id, day, lesson_number, week_parity);
+        # room_options[i] — кабинеты, куда можно перенести урок i
+        self.rng = random.Random(seed)
+        self.t_start = t_start
+        self.t_end = t_end
+        self.room_options = [tuple(options) for options in room_options]
+        self.class_of = [l[0] for l in lessons]
+        self.teacher_of = [l[1] for l in lessons]
+        self.weeks_of = [weeks_of(l[5]) for l in lessons]
+        self.positions = []  # (day, slot, room_id) для каждого урока
+
+        self.occupancy = WeekOccupancy((WEEK_A, WEEK_B))
+        self.frozen = []  # уроки с накладкой в исходном расписании не двигаются
+        self.frozen_at = {}
+        self.movable = []
+        for i, (class_id, teacher_id, room_id, day, slot, _) in enumerate(lessons):
+            self.positions.append((day, slot, room_id))
+            if self.occupancy.conflicts(self.weeks_of[i], class_id, teacher_id, room_id, day, slot):
+                self.frozen.append(i)
+                self.frozen_at.setdefault((day, slot), []).append(i)
+            else:
+                self.movable.append(i)
+            self.occupancy.place(self.weeks_of[i], class_id, teacher_id, room_id, day, slot)
+
+        self.by_class = {}
+        for i in self.movable:
+            self.by_class.setdefault(self.class_of[i], []).append(i)
+
+        self.cost = self.full_cost()
+        self.best_cost = self.cost
+        self.best_positions = list(self.positions)
+        self.iterations = 0
+        self.accepted = 0
+
+    def full_cost(self):
+        occupancy = self.occupancy
+        cost = 0
+        for weeks in WEEKS:
+            for class_id in set(self.class_of):
+                for day in range(N_DAYS):
+                    cost += CLASS_WINDOW_WEIGHT * day_windows(occupancy.day_bits(weeks, class_id, day))
+            for teacher_id in set(self.teacher_of):
+                mask = occupancy.teacher_mask(weeks, teacher_id)
+                for day in range(N_DAYS):
+                    cost += TEACHER_WINDOW_WEIGHT * day_windows((mask >> (day * N_SLOTS)) & DAY_MASK)
+        return cost
+
+    def _day_cost(self, keys):
+        occupancy = self.occupancy
+        cost = 0
+        for weeks in WEEKS:
+            for kind, key, day in keys:
+                if kind == "class":
+                    cost += CLASS_WINDOW_WEIGHT * day_windows(occupancy.day_bits(weeks, key, day))
+                elif key is not None:
+                    mask = occupancy.teacher_mask(weeks, key)
+                    cost += TEACHER_WINDOW_WEIGHT * day_windows((mask >> (day * N_SLOTS)) & DAY_MASK)
+        return cost
+
+    def _remove(self, i):
+        day, slot, room_id = self.positions[i]
+        self.occupancy.remove(self.weeks_of[i], self.class_of[i], self.teacher_of[i], room_id, day, slot)
+        # Замороженные уроки в этом слоте продолжают его занимать
+        for j in self.frozen_at.get((day, slot), ()):
+            d, s, r = self.positions[j]
+            self.occupancy.place(self.weeks_of[j], self.class_of[j], self.teacher_of[j], r, d, s)
+
+    def _place(self, i, day, slot, room_id):
+        self.positions[i] = (day, slot, room_id)
+        self.occupancy.place(self.weeks_of[i], self.class_of[i], self.teacher_of[i], room_id, day, slot)
+
+    def _affected(self, lessons, days):
+        return {(kind, key, day)
+                for i in lessons for day in days
+                for kind, key in (("class", self.class_of[i]), ("teacher", self.teacher_of[i]))}
+
+    def try_move(self, temperature):
+        i = self.rng.choice(self.movable)
+        old = self.positions[i]
+        day, slot = self.rng.randrange(N_DAYS), self.rng.randint(1, N_SLOTS)
+        room_id = self.rng.choice(self.room_options[i])
+        if (day, slot, room_id) == old:
+            return False
+        if not self.occupancy.is_free(self.weeks_of[i], self.class_of[i], self.teacher_of[i], room_id, day, slot):
+            return False
+
+        keys = self._affected([i], {old[0], day})
+        before = self._day_cost(keys)
+        self._remove(i)
+        self._place(i, day, slot, room_id)
+        delta = self._day_cost(keys) - before
+        if self._accept(delta, temperature):
+            self.cost += delta
+            return True
+        self._remove(i)
+        self._place(i, *old)
+        return False
+
+    def try_swap(self, temperature):
+        i = self.rng.choice(self.movable)
+        same_class = self.by_class[self.class_of[i]]
+        j = self.rng.choice(same_class)
+        old_i, old_j = self.positions[i], self.positions[j]
+        if i == j or old_i[:2] == old_j[:2]:
+            return False
+
+        keys = self._affected([i, j], {old_i[0], old_j[0]})
+        before = self._day_cost(keys)
+        self._remove(i)
+        self._remove(j)
+        # Каждый урок переходит во время другого со своим кабинетом
+        target_i = (old_j[0], old_j[1], old_i[2])
+        target_j = (old_i[0], old_i[1], old_j[2])
+        if self.occupancy.is_free(self.weeks_of[i], self.class_of[i], self.teacher_of[i], target_i[2],
+                                  *target_i[:2]):
+            self._place(i, *target_i)
+            if self.occupancy.is_free(self.weeks_of[j], self.class_of[j], self.teacher_of[j], target_j[2],
+                                      *target_j[:2]):
+                self._place(j, *target_j)
+                delta = self._day_cost(keys) - before
+                if self._accept(delta, temperature):
+                    self.cost += delta
+                    return True
+                self._remove(j)
+            self._remove(i)
+        self._place(i, *old_i)
+        self._place(j, *old_j)
+        return False
+
+    def _accept(self, delta, temperature):
+        if delta <= 0:
+            return True
+        return self.rng.random() < math.exp(-delta / temperature)
+
+    def run(self, time_limit=10.0, on_progress=None, should_stop=None):
+        if not self.movable:
+            return self.best_positions, self.best_cost
+        started = time.monotonic()
+        while True:
+            elapsed = time.monotonic() - started
+            if elapsed >= time_limit or self.best_cost == 0:
+                break
+            # Проверка отмены и часов раз в 256 итераций
+            for _ in range(256):
+                temperature = self.t_start * (self.t_end / self.t_start) ** (elapsed / time_limit)
+                moved = self.try_swap(temperature) if self.rng.random() < 0.5 else self.try_move(temperature)
+                self.iterations += 1
+                if moved:
+                    self.accepted += 1
+                    if self.cost < self.best_cost:
+                        self.best_cost = self.cost
+                        self.best_positions = list(self.positions)
+                        if on_progress:
+                            on_progress(self.iterations, self.best_cost)
+            if should_stop and should_stop():
+                break
+        return self.best_positions, self.best_cost
+
+    def best(self):
+        # Лучшее найденное решение доступно в любой момент
+        return list(self.best_positions), self.best_cost
+
+
+def optimize_schedule(db: Session, time_limit=10.0, seed=None, on_progress=None, should_stop=None,
+                      curriculum=None):
+    with phase("load"):
+        lessons = active_lessons(db).order_by(Lesson.id).all()
+    if not lessons:
+        print("⚠️ Расписание пусто — нечего оптимизировать")
+        return None
+
+    # Куда можно переносить урок: кабинеты из учебного плана или по названию предмета
+    with phase("curriculum"):
+        if curriculum is not None:
+            plan = {(item.class_id, item.subject_id): item.room_ids for item in curriculum}
+            options = [plan.get((l.class_id, l.subject_id)) or (l.room_id,) for l in lessons]
+        else:
+            refdata = get_reference_data(db)
+            options = []
+            for l in lessons:
+                subject = refdata.subject(l.subject_id)
+                options.append((subject_rooms(refdata, subject.name) if subject else ()) or (l.room_id,))
+
+    search = LocalSearch(
+        [(l.class_id, l.teacher_id, l.room_id, l.day, l.lesson_number, l.week_parity) for l in lessons],
+        options, seed=seed,
+    )
+    start_cost = search.cost
+    with phase("optimisation"):
+        positions, cost = search.run(time_limit, on_progress=on_progress, should_stop=should_stop)
+    count("iterations", search.iterations)
+    count("moves_accepted", search.accepted)
+    if should_stop and should_stop():
+        print("⏹ Оптимизация отменена")
+        return None
+
+    moved = []
+    for lesson, (day, slot, room_id) in zip(lessons, positions):
+        if (lesson.day, lesson.lesson_number, lesson.room_id) != (day, slot, room_id):
+            lesson.day, lesson.lesson_number, lesson.room_id = day, slot, room_id
+            moved.append(lesson)
+    with phase("persist"):
+        move_lessons(db, moved)
+        touch_version(db, lessons[0].version_id)
+        db.commit()
+    count("lessons_moved", len(moved))
+
+    print(f"✅ Локальный поиск: стоимость окон {start_cost} → {cost}, "
+          f"перемещено {len(moved)} уроков за {search.iterations} итераций.")
+    return lessons[0].version_id
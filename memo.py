@@ -0,0 +1,121 @@
+# fast_api/memo.py
+# Кэш результатов генерации. Отпечаток входа — учебный план, состав учителей и
+# кабинетов, размер сетки, веса ограничений и параметры генератора. Версия
+# расписания помечается отпечатком и зерном. Повторный запрос с тем же ключом
+# просто снова делает активной сохранённую версию. При тёплом старте новый
+# учебный план накладывается на последний результат того же режима через
+# ремонт, и переставляется только то, что изменилось. Тёплые результаты
+# сохраняются без зерна: их содержимое зависит от истории, а не только от ключа.
+import hashlib
+import json
+import random
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .config import GENERATION_SEED, GENERATION_WORKERS
+from .genetic import CURRICULUM_BUILDERS, HARD_PENALTY, MAX_SAME_SUBJECT_PER_DAY
+from .metrics import phase, count
+from .models import Lesson, ScheduleVersion
+from .occupancy import N_DAYS, N_SLOTS
+from .persist import publish_schedule, activate_version, active_version_id, LESSON_COLUMNS
+from .refdata import get_reference_data
+from .repair import repair_schedule
+
+def input_fingerprint(mode, curriculum, refdata, params):
+    payload = {
+        "mode": mode,
+        "curriculum": sorted([item.class_id, item.subject_id, item.teacher_id, list(item.room_ids), item.hours]
+                             for item in curriculum),
+        "teachers": [t.id for t in refdata.teachers],
+        "rooms": [r.id for r in refdata.rooms],
+        "constraints": [N_DAYS, N_SLOTS, HARD_PENALTY, MAX_SAME_SUBJECT_PER_DAY],
+        "params": sorted(params.items()),
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def find_cached_version(db: Session, mode, fingerprint, seed):
+    # Только нетронутые версии: после ручной правки версия уже не результат генератора
+    return db.execute(
+        select(ScheduleVersion.id)
+        .where(ScheduleVersion.source == mode, ScheduleVersion.fingerprint == fingerprint,
+               ScheduleVersion.seed == seed, ScheduleVersion.revision == 0)
+        .order_by(ScheduleVersion.id.desc())
+    ).scalar()
+
+
+def find_warm_base(db: Session, mode):
+    # Последний результат того же режима — холодный или тёплый
+    return db.execute(
+        select(ScheduleVersion.id, ScheduleVersion.fingerprint, ScheduleVersion.seed)
+        .where(ScheduleVersion.source == mode, ScheduleVersion.fingerprint.is_not(None))
+        .order_by(ScheduleVersion.id.desc())
+    ).first()
+
+
+def tag_version(db: Session, version_id, fingerprint, seed):
+    version = db.get(ScheduleVersion, version_id)
+    version.fingerprint, version.seed = fingerprint, seed
+    db.commit()
+
+
+def warm_start(db: Session, mode, base_id, curriculum):
+    # Копия базовой версии становится активной, затем ремонт приводит её к новому плану
+    columns = [getattr(Lesson, c) for c in LESSON_COLUMNS if c != "version_id"]
+    rows = [row._asdict() for row in db.execute(select(*columns).where(Lesson.version_id == base_id))]
+    version_id = publish_schedule(db, rows, source=mode)
+    # План мог уменьшиться — лишние часы базовой версии здесь удаляются
+    stats = repair_schedule(db, curriculum=curriculum, remove_excess=True)
+    count("lessons_moved", stats["moved"])
+    count("unplaced", stats["unplaced"])
+    return version_id
+
+
+def generate_cached(db: Session, mode, generator, seed=None, warm=False, on_progress=None, should_stop=None,
+                    **params):
+    requested_seed = seed
+    if seed is None:
+        seed = GENERATION_SEED if GENERATION_SEED is not None else random.randrange(1 << 31)
+    if mode == "islands":
+        params.setdefault("workers", GENERATION_WORKERS)  # число островов влияет на результат
+
+    with phase("curriculum"):
+        curriculum = CURRICULUM_BUILDERS[mode](db)
+        fingerprint = input_fingerprint(mode, curriculum, get_reference_data(db), params)
+
+    cached = find_cached_version(db, mode, fingerprint, seed)
+    if cached is not None:
+        count("cache_hits")
+        if cached != active_version_id(db):
+            activate_version(db, cached)
+        if on_progress:
+            on_progress(0, 0)
+        print(f"✅ Расписание взято из кэша: версия {cached} (зерно {seed})")
+        return cached
+
+    base = find_warm_base(db, mode) if warm else None
+    if base is not None and base.fingerprint == fingerprint:
+        if requested_seed is None or base.seed == requested_seed:
+            # Входные данные не менялись с последнего результата — он и есть ответ
+            count("cache_hits")
+            if base.id != active_version_id(db):
+                activate_version(db, base.id)
+            print(f"✅ Входные данные не изменились: версия {base.id}")
+            return base.id
+        # Зерно задано явно и другое: копия базы с тем же планом его бы не учла — считаем заново
+        base = None
+
+    count("cache_misses")
+    if base is not None:
+        with phase("placement"):
+            version_id = warm_start(db, mode, base.id, curriculum)
+        tag_version(db, version_id, fingerprint, None)
+        print(f"✅ Тёплый старт от версии {base.id}: новая версия {version_id}")
+        return version_id
+
+    version_id = generator(db, on_progress=on_progress, should_stop=should_stop,
+                           curriculum=curriculum, seed=seed, **params)
+    if version_id is not None:
+        tag_version(db, version_id, fingerprint, seed)
+    return version_id
@@ -0,0 +1,200 @@
+# fast_api/metrics.py
+# Метрики процесса в формате Prometheus (/metrics): задержка и число SQL-запросов
+# по маршрутам, фазы и счётчики генераторов расписания.
+# Генератор размечает фазы через `with phase("placement"):` и счётчики через
+# count("backtracks", n); вне generation_run() эти вызовы ничего не делают.
+# Фазы могут вкладываться (load внутри curriculum) — время у каждой включающее.
+# Прогон в дочернем процессе возвращает summary() в веб-процесс вместе с
+# событием задачи, и там он сливается в общий реестр через record_run().
+import contextvars
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+PROFILE_LINES = 40
+
+_current_run = contextvars.ContextVar("generation_run", default=None)
+_current_queries = contextvars.ContextVar("request_queries", default=None)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}    # (имя, метки) -> значение
+        self.histograms = {}  # (имя, метки) -> Histogram
+        self.help = {}
+        self.types = {}
+
+    def _declare(self, name, kind, help_text):
+        self.types.setdefault(name, kind)
+        if help_text:
+            self.help.setdefault(name, help_text)
+
+    def inc(self, name, value=1, labels=(), help_text=None):
+        with self.lock:
+            self._declare(name, "counter", help_text)
+            key = (name, tuple(labels))
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=LATENCY_BUCKETS, labels=(), help_text=None):
+        with self.lock:
+            self._declare(name, "histogram", help_text)
+            key = (name, tuple(labels))
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def observe_request(self, method, route, status, seconds, queries):
+        labels = (("method", method), ("route", route))
+        self.inc("http_requests_total", labels=labels + (("status", status),),
+                 help_text="Число HTTP-запросов")
+        self.observe("http_request_duration_seconds", seconds, labels=labels,
+                     help_text="Время обработки запроса до начала ответа")
+        self.observe("http_request_sql_queries", queries, QUERY_BUCKETS, labels=labels,
+                     help_text="SQL-запросов на один HTTP-запрос")
+
+    def record_run(self, summary, status="done"):
+        mode = summary["mode"]
+        self.inc("schedule_runs_total", labels=(("mode", mode), ("status", status)),
+                 help_text="Запуски генераторов расписания")
+        for name, seconds in summary["phases"].items():
+            self.inc("schedule_phase_seconds_total", seconds, labels=(("mode", mode), ("phase", name)),
+                     help_text="Суммарное время фаз генерации")
+        for name, value in summary["counters"].items():
+            self.inc("schedule_generator_events_total", value, labels=(("mode", mode), ("counter", name)),
+                     help_text="Счётчики генераторов: попытки, возвраты, непоставленные уроки")
+
+    def render(self, extra=()):
+        # Текстовый формат Prometheus; extra — готовые (имя, тип, справка, значение) снаружи реестра
+        lines = []
+        with self.lock:
+            by_name = {}
+            for (name, labels), value in self.counters.items():
+                by_name.setdefault(name, []).append((labels, value))
+            for (name, labels), histogram in self.histograms.items():
+                by_name.setdefault(name, []).append((labels, histogram))
+            for name in sorted(by_name):
+                if name in self.help:
+                    lines.append(f"# HELP {name} {self.help[name]}")
+                lines.append(f"# TYPE {name} {self.types[name]}")
+                for labels, value in sorted(by_name[name], key=lambda item: item[0]):
+                    if isinstance(value, Histogram):
+                        for bound, hits in zip(value.buckets, value.counts):
+                            lines.append(f"{name}_bucket{_labels(labels + (('le', bound),))} {hits}")
+                        lines.append(f"{name}_bucket{_labels(labels + (('le', '+Inf'),))} {value.count}")
+                        lines.append(f"{name}_sum{_labels(labels)} {round(value.total, 6)}")
+                        lines.append(f"{name}_count{_labels(labels)} {value.count}")
+                    else:
+                        lines.append(f"{name}{_labels(labels)} {round(value, 6)}")
+        for name, kind, help_text, value in extra:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class GenerationRun:
+    def __init__(self, mode):
+        self.mode = mode
+        self.phases = {}
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.profile = None
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        phases = {name: round(seconds, 6) for name, seconds in self.phases.items()}
+        phases["total"] = round(time.perf_counter() - self.started, 6)
+        return {"mode": self.mode, "phases": phases, "counters": dict(self.counters)}
+
+
+@contextmanager
+def generation_run(mode, profile=False):
+    # profile=True снимает cProfile этого прогона; текст отчёта — в run.profile
+    run = GenerationRun(mode)
+    token = _current_run.set(run)
+    profiler = cProfile.Profile() if profile else None
+    if profiler:
+        profiler.enable()
+    try:
+        yield run
+    finally:
+        if profiler:
+            profiler.disable()
+            report = io.StringIO()
+            pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_LINES)
+            run.profile = report.getvalue()
+        _current_run.reset(token)
+
+
+def phase(name):
+    run = _current_run.get()
+    return run.phase(name) if run is not None else nullcontext()
+
+
+def count(name, value=1):
+    run = _current_run.get()
+    if run is not None and value:
+        run.count(name, value)
+
+
+@contextmanager
+def track_queries():
+    # Счётчик SQL-запросов текущего HTTP-запроса; список, чтобы его видели потоки пула
+    counter = [0]
+    token = _current_queries.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_queries.reset(token)
+
+
+def count_query(*args, **kwargs):
+    # Обработчик события SQLAlchemy before_cursor_execute
+    counter = _current_queries.get()
+    if counter is not None:
+        counter[0] += 1
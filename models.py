@@ -1,5 +1,6 @@
 # fast_api/models.py
-from sqlalchemy import Column, Integer, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, Date, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import DeclarativeBase, relationship
 
 class Base(DeclarativeBase):
@@ -39,17 +40,67 @@ class Teacher(Base):
     lessons = relationship("Lesson", back_populates="teacher")
 
 
+class AppMeta(Base):
+    __tablename__ = 'app_meta'
+    key = Column(String, primary_key=True)
+    value = Column(String)
+
+
+class ScheduleVersion(Base):
+    __tablename__ = 'schedule_versions'
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    source = Column(String)  # каким генератором получена версия
+    is_active = Column(Boolean, default=False, index=True)
+    revision = Column(Integer, default=0, nullable=False)  # растёт при каждой правке уроков версии
+    fingerprint = Column(String, index=True)  # отпечаток входных данных генерации
+    seed = Column(Integer)  # зерно генератора: вместе с отпечатком — ключ кэша результатов
+    lessons = relationship("Lesson", back_populates="version")
+
+
 class Lesson(Base):
     __tablename__ = 'schedule'
+    # Один урок на класс, кабинет и учителя в каждый слот версии (индексы для проверки накладок).
+    # Уроки недель А и Б могут делить слот; с уроком «каждую неделю» их разводит find_conflicts,
+    # которую пишущие запросы вызывают под блокировкой строки версии (touch_version)
+    __table_args__ = (
+        UniqueConstraint('version_id', 'class_id', 'day', 'lesson_number', 'week_parity',
+                         name='uq_schedule_class_slot'),
+        UniqueConstraint('version_id', 'room_id', 'day', 'lesson_number', 'week_parity',
+                         name='uq_schedule_room_slot'),
+        UniqueConstraint('version_id', 'teacher_id', 'day', 'lesson_number', 'week_parity',
+                         name='uq_schedule_teacher_slot'),
+    )
     id = Column(Integer, primary_key=True)
+    version_id = Column(Integer, ForeignKey('schedule_versions.id'), index=True)
     day = Column(Integer)  # Было: day_of_week → теперь day
     lesson_number = Column(Integer)
     class_id = Column(Integer, ForeignKey('classes.id'))
     subject_id = Column(Integer, ForeignKey('subjects.id'))
     teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=True)
     room_id = Column(Integer, ForeignKey('rooms.id'))
+    week_parity = Column(Integer, default=0, server_default='0', nullable=False)  # 0 — каждую неделю, 1 — А, 2 — Б
 
     school_class = relationship("SchoolClass", back_populates="lessons")
     subject = relationship("Subject", back_populates="lessons")
     teacher = relationship("Teacher", back_populates="lessons")
-    room = relationship("Room", back_populates="lessons")
\ No newline at end of file
+    room = relationship("Room", back_populates="lessons")
+    version = relationship("ScheduleVersion", back_populates="lessons")
+
+
+class ScheduleException(Base):
+    __tablename__ = 'schedule_exceptions'
+    # Датированное отклонение от недельного шаблона: каникулы, отмена или замена урока.
+    # Не привязано к версии расписания — каникулы переживают перегенерацию
+    __table_args__ = (
+        Index('ix_schedule_exceptions_date_class', 'date', 'class_id'),
+    )
+    id = Column(Integer, primary_key=True)
+    date = Column(Date, nullable=False)
+    class_id = Column(Integer, ForeignKey('classes.id'), nullable=True)  # None — вся школа
+    lesson_number = Column(Integer, nullable=True)  # None — весь день
+    kind = Column(String, nullable=False)  # cancel | replace
+    subject_id = Column(Integer, ForeignKey('subjects.id'), nullable=True)
+    teacher_id = Column(Integer, ForeignKey('teachers.id'), nullable=True)
+    room_id = Column(Integer, ForeignKey('rooms.id'), nullable=True)
+    note = Column(String)
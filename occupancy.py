@@ -0,0 +1,199 @@
+# fast_api/occupancy.py
+# Битовая сетка занятости: для каждого класса, учителя и кабинета одно целое число,
+# где бит day * 8 + (slot - 1) означает «занят в этот день на этом уроке».
+# Массивы плотные и индексируются id из БД.
+
+N_DAYS = 5    # Пн–Пт
+N_SLOTS = 8   # Уроки 1–8
+N_TIMES = N_DAYS * N_SLOTS
+
+DAY_MASKS = [((1 << N_SLOTS) - 1) << (day * N_SLOTS) for day in range(N_DAYS)]
+WEEK_MASK = (1 << N_TIMES) - 1
+
+
+def slot_bit(day, slot):
+    return 1 << (day * N_SLOTS + slot - 1)
+
+
+def bit_to_slot(index):
+    return index // N_SLOTS, index % N_SLOTS + 1
+
+
+def popcount(mask):
+    return bin(mask).count("1")
+
+
+def day_windows(bits):
+    # Пустые уроки между первым и последним занятым в пределах одного дня
+    if not bits:
+        return 0
+    first = (bits & -bits).bit_length() - 1
+    return bits.bit_length() - first - popcount(bits)
+
+
+def mask_windows(mask):
+    return sum(day_windows((mask >> (day * N_SLOTS)) & ((1 << N_SLOTS) - 1)) for day in range(N_DAYS))
+
+
+def nearest_in(free, day, anchor):
+    # Свободный бит дня, ближайший к anchor (при равенстве — более ранний)
+    for distance in range(N_SLOTS):
+        for slot in (anchor - distance, anchor + distance):
+            if 1 <= slot <= N_SLOTS and free & slot_bit(day, slot):
+                return day, slot
+    return None
+
+
+def slots_mask(day, slots):
+    mask = 0
+    for slot in slots:
+        mask |= slot_bit(day, slot)
+    return mask
+
+
+class Occupancy:
+    KINDS = ("class", "teacher", "room")
+
+    def __init__(self):
+        self.classes = []
+        self.teachers = []
+        self.rooms = []
+
+    def reserve(self, max_class_id, max_teacher_id, max_room_id):
+        # Заранее выделяет плотные массивы, чтобы их можно было индексировать напрямую
+        for masks, size in ((self.classes, max_class_id), (self.teachers, max_teacher_id), (self.rooms, max_room_id)):
+            if size + 1 > len(masks):
+                masks.extend([0] * (size + 1 - len(masks)))
+
+    @classmethod
+    def from_lessons(cls, lessons):
+        occupancy = cls()
+        for lesson in lessons:
+            occupancy.place(lesson.class_id, lesson.teacher_id, lesson.room_id, lesson.day, lesson.lesson_number)
+        return occupancy
+
+    @staticmethod
+    def _get(masks, index):
+        if index is None or index >= len(masks):
+            return 0
+        return masks[index]
+
+    @staticmethod
+    def _set(masks, index, value):
+        if index is None:
+            return
+        if index >= len(masks):
+            masks.extend([0] * (index + 1 - len(masks)))
+        masks[index] = value
+
+    def class_mask(self, class_id):
+        return self._get(self.classes, class_id)
+
+    def teacher_mask(self, teacher_id):
+        return self._get(self.teachers, teacher_id)
+
+    def room_mask(self, room_id):
+        return self._get(self.rooms, room_id)
+
+    def busy_mask(self, class_id, teacher_id, room_id):
+        return (self._get(self.classes, class_id)
+                | self._get(self.teachers, teacher_id)
+                | self._get(self.rooms, room_id))
+
+    def free_mask(self, class_id, teacher_id, room_id, day=None):
+        allowed = WEEK_MASK if day is None else DAY_MASKS[day]
+        return ~self.busy_mask(class_id, teacher_id, room_id) & allowed
+
+    def is_free(self, class_id, teacher_id, room_id, day, slot):
+        return not self.busy_mask(class_id, teacher_id, room_id) & slot_bit(day, slot)
+
+    def first_free(self, class_id, teacher_id, room_id, day=None, allowed=WEEK_MASK):
+        # Младший свободный бит: (day, slot) или None
+        free = self.free_mask(class_id, teacher_id, room_id, day) & allowed
+        if not free:
+            return None
+        return bit_to_slot((free & -free).bit_length() - 1)
+
+    def nearest_free(self, class_id, teacher_id, room_id, day, anchor, allowed=WEEK_MASK):
+        # Свободный слот дня, ближайший к anchor (при равенстве — более ранний)
+        free = self.free_mask(class_id, teacher_id, room_id, day) & allowed
+        return nearest_in(free, day, anchor) if free else None
+
+    def conflicts(self, class_id, teacher_id, room_id, day, slot):
+        bit = slot_bit(day, slot)
+        busy = (self._get(self.classes, class_id) & bit,
+                self._get(self.teachers, teacher_id) & bit,
+                self._get(self.rooms, room_id) & bit)
+        return [kind for kind, flag in zip(self.KINDS, busy) if flag]
+
+    def block_room(self, room_id, mask):
+        # Помечает кабинет занятым (например, на ремонте) в указанных битах
+        self._set(self.rooms, room_id, self._get(self.rooms, room_id) | mask)
+
+    def day_bits(self, class_id, day):
+        return (self._get(self.classes, class_id) >> (day * N_SLOTS)) & ((1 << N_SLOTS) - 1)
+
+    def class_windows(self):
+        return sum(mask_windows(mask) for mask in self.classes)
+
+    def place(self, class_id, teacher_id, room_id, day, slot):
+        bit = slot_bit(day, slot)
+        self._set(self.classes, class_id, self._get(self.classes, class_id) | bit)
+        self._set(self.teachers, teacher_id, self._get(self.teachers, teacher_id) | bit)
+        self._set(self.rooms, room_id, self._get(self.rooms, room_id) | bit)
+
+    def remove(self, class_id, teacher_id, room_id, day, slot):
+        bit = ~slot_bit(day, slot)
+        self._set(self.classes, class_id, self._get(self.classes, class_id) & bit)
+        self._set(self.teachers, teacher_id, self._get(self.teachers, teacher_id) & bit)
+        self._set(self.rooms, room_id, self._get(self.rooms, room_id) & bit)
+
+
+class WeekOccupancy:
+    # Занятость по чередующимся неделям (А и Б): по сетке Occupancy на неделю.
+    # Каждый метод первым аргументом получает недели урока; урок «каждую неделю»
+    # передаёт обе, и слот должен быть свободен в каждой из них.
+    def __init__(self, weeks):
+        self.weeks = {week: Occupancy() for week in weeks}
+
+    def busy_mask(self, weeks, class_id, teacher_id, room_id):
+        mask = 0
+        for week in weeks:
+            mask |= self.weeks[week].busy_mask(class_id, teacher_id, room_id)
+        return mask
+
+    def is_free(self, weeks, class_id, teacher_id, room_id, day, slot):
+        return not self.busy_mask(weeks, class_id, teacher_id, room_id) & slot_bit(day, slot)
+
+    def nearest_free(self, weeks, class_id, teacher_id, room_id, day, anchor, allowed=WEEK_MASK):
+        free = ~self.busy_mask(weeks, class_id, teacher_id, room_id) & DAY_MASKS[day] & allowed
+        return nearest_in(free, day, anchor) if free else None
+
+    def conflicts(self, weeks, class_id, teacher_id, room_id, day, slot):
+        found = {kind for week in weeks
+                 for kind in self.weeks[week].conflicts(class_id, teacher_id, room_id, day, slot)}
+        return [kind for kind in Occupancy.KINDS if kind in found]
+
+    def block_room(self, room_id, mask):
+        for occupancy in self.weeks.values():
+            occupancy.block_room(room_id, mask)
+
+    def day_bits(self, weeks, class_id, day):
+        bits = 0
+        for week in weeks:
+            bits |= self.weeks[week].day_bits(class_id, day)
+        return bits
+
+    def teacher_mask(self, weeks, teacher_id):
+        mask = 0
+        for week in weeks:
+            mask |= self.weeks[week].teacher_mask(teacher_id)
+        return mask
+
+    def place(self, weeks, class_id, teacher_id, room_id, day, slot):
+        for week in weeks:
+            self.weeks[week].place(class_id, teacher_id, room_id, day, slot)
+
+    def remove(self, weeks, class_id, teacher_id, room_id, day, slot):
+        for week in weeks:
+            self.weeks[week].remove(class_id, teacher_id, room_id, day, slot)
@@ -0,0 +1,143 @@
+# fast_api/persist.py
+# Запись сгенерированного расписания новой версией: один массовый INSERT
+# (COPY на PostgreSQL), затем атомарное переключение активной версии.
+# Читатели /schedule всегда видят либо старую, либо новую версию целиком.
+import csv
+import io
+
+from sqlalchemy import insert, update, delete, select
+from sqlalchemy.orm import Session
+
+from .models import Lesson, ScheduleVersion
+from .weeks import EVERY_WEEK
+
+LESSON_COLUMNS = ("version_id", "class_id", "subject_id", "teacher_id", "room_id", "day", "lesson_number",
+                  "week_parity")
+BATCH_SIZE = 1000
+KEEP_VERSIONS = 3  # сколько последних неактивных версий хранить для отката
+
+
+def active_lessons(db: Session):
+    return db.query(Lesson).join(ScheduleVersion).filter(ScheduleVersion.is_active.is_(True))
+
+
+def active_version_id(db: Session):
+    return db.execute(
+        select(ScheduleVersion.id).where(ScheduleVersion.is_active.is_(True))
+    ).scalar()
+
+
+def ensure_active_version(db: Session):
+    # Ручное редактирование до первой генерации создаёт пустую активную версию
+    version_id = active_version_id(db)
+    if version_id is None:
+        version = ScheduleVersion(source="manual", is_active=True)
+        db.add(version)
+        db.flush()
+        version_id = version.id
+    return version_id
+
+
+def touch_version(db: Session, version_id):
+    # Отмечает правку на месте (без новой версии) — от ревизии зависят ETag выгрузок
+    # и актуальность индекса сеток; возвращает новую ревизию
+    return db.execute(
+        update(ScheduleVersion).where(ScheduleVersion.id == version_id)
+        .values(revision=ScheduleVersion.revision + 1)
+        .returning(ScheduleVersion.revision),
+        execution_options={"synchronize_session": False},
+    ).scalar()
+
+
+def _copy_rows(db: Session, rows):
+    # COPY через DBAPI-соединение той же транзакции (psycopg2 или psycopg 3)
+    cursor = db.connection().connection.dbapi_connection.cursor()
+    statement = f"COPY {Lesson.__tablename__} ({', '.join(LESSON_COLUMNS)}) FROM STDIN"
+    try:
+        if hasattr(cursor, "copy_expert"):
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(["" if row[c] is None else row[c] for c in LESSON_COLUMNS])
+            buffer.seek(0)
+            cursor.copy_expert(statement + " WITH (FORMAT csv)", buffer)
+        elif hasattr(cursor, "copy"):
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row([row[c] for c in LESSON_COLUMNS])
+        else:
+            return False
+    finally:
+        cursor.close()
+    return True
+
+
+def bulk_insert_lessons(db: Session, rows, copy=True):
+    # copy=False, когда вызывающему нужен IntegrityError: ошибки COPY не оборачиваются SQLAlchemy
+    # Генераторы строят шаблон без недель А/Б — такие уроки идут каждую неделю
+    rows = [{c: row.get(c) for c in LESSON_COLUMNS} | {"week_parity": row.get("week_parity") or EVERY_WEEK}
+            for row in rows]
+    if not rows:
+        return
+    if copy and db.get_bind().dialect.name == "postgresql" and _copy_rows(db, rows):
+        return
+    # executemany пачками на остальных СУБД
+    for start in range(0, len(rows), BATCH_SIZE):
+        db.execute(insert(Lesson), rows[start:start + BATCH_SIZE])
+
+
+def move_lessons(db: Session, moved):
+    # Перемещённые уроки уже содержат новые day/lesson_number/room_id. Чтобы UPDATE по одному
+    # не нарушали уникальные ограничения слотов посреди flush, уроки сначала уводятся во
+    # временный слот (отрицательный номер урока), а затем ставятся на место.
+    targets = {lesson: lesson.lesson_number for lesson in moved}
+    for lesson in targets:
+        lesson.lesson_number = -lesson.id
+    db.flush()
+    for lesson, lesson_number in targets.items():
+        lesson.lesson_number = lesson_number
+    db.flush()
+
+
+def publish_schedule(db: Session, rows, source=None, keep=KEEP_VERSIONS):
+    version = ScheduleVersion(source=source, is_active=False)
+    db.add(version)
+    db.flush()
+
+    bulk_insert_lessons(db, [dict(row, version_id=version.id) for row in rows])
+
+    # Переключение активной версии — одна инструкция в той же транзакции
+    _switch_active(db, version.id)
+    db.commit()
+
+    collect_old_versions(db, keep)
+    return version.id
+
+
+def _switch_active(db: Session, version_id):
+    db.execute(
+        update(ScheduleVersion).values(is_active=(ScheduleVersion.id == version_id)),
+        execution_options={"synchronize_session": False},
+    )
+
+
+def activate_version(db: Session, version_id):
+    # Возврат к уже сохранённой версии (кэш результатов генерации, откат) без перезаписи уроков
+    _switch_active(db, version_id)
+    db.commit()
+    return version_id
+
+
+def collect_old_versions(db: Session, keep=KEEP_VERSIONS):
+    stale = db.execute(
+        select(ScheduleVersion.id)
+        .where(ScheduleVersion.is_active.is_(False))
+        .order_by(ScheduleVersion.id.desc())
+        .offset(keep)
+    ).scalars().all()
+    if not stale:
+        return 0
+    db.execute(delete(Lesson).where(Lesson.version_id.in_(stale)))
+    db.execute(delete(ScheduleVersion).where(ScheduleVersion.id.in_(stale)))
+    db.commit()
+    return len(stale)
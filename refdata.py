@@ -0,0 +1,175 @@
+# fast_api/refdata.py
+# Неизменяемый снимок справочников (классы, предметы, кабинеты, учителя) на процесс.
+# Снимок перечитывается, только когда меняется счётчик версии данных в app_meta;
+# сам счётчик проверяется не чаще раза в REFERENCE_DATA_TTL секунд.
+import threading
+import time
+from typing import NamedTuple
+
+from sqlalchemy import select, update, insert
+from sqlalchemy.orm import Session
+
+from .config import REFERENCE_DATA_TTL
+from .models import AppMeta, SchoolClass, Subject, Room, Teacher
+
+DATA_VERSION_KEY = "reference_data_version"
+
+
+class ClassRow(NamedTuple):
+    id: int
+    number: int
+    letter: str
+
+
+class SubjectRow(NamedTuple):
+    id: int
+    name: str
+    teacher_id: int
+    hours_per_week: int
+
+
+class RoomRow(NamedTuple):
+    id: int
+    name: str
+
+
+class TeacherRow(NamedTuple):
+    id: int
+    name: str
+
+
+def _by_id(rows):
+    # Плотный массив, индексируемый id; пропуски — None
+    dense = [None] * (max((r.id for r in rows), default=-1) + 1)
+    for row in rows:
+        dense[row.id] = row
+    return tuple(dense)
+
+
+class ReferenceData:
+    def __init__(self, version, classes, subjects, rooms, teachers):
+        self.version = version
+        self.classes = tuple(classes)
+        self.subjects = tuple(subjects)
+        self.rooms = tuple(rooms)
+        self.teachers = tuple(teachers)
+
+        self.class_by_id = _by_id(self.classes)
+        self.subject_by_id = _by_id(self.subjects)
+        self.room_by_id = _by_id(self.rooms)
+        self.teacher_by_id = _by_id(self.teachers)
+
+        self.class_by_name = {f"{c.number}{c.letter}": c for c in self.classes}
+        self.subject_by_name = {s.name: s for s in self.subjects}
+        self.room_by_name = {r.name: r for r in self.rooms}
+        self.teacher_by_name = {t.name: t for t in self.teachers}
+
+        classes_by_number = {}
+        for c in self.classes:
+            classes_by_number.setdefault(c.number, []).append(c)
+        self.classes_by_number = {k: tuple(v) for k, v in classes_by_number.items()}
+
+    @staticmethod
+    def _lookup(dense, item_id):
+        if item_id is None or not 0 <= item_id < len(dense):
+            return None
+        return dense[item_id]
+
+    def school_class(self, class_id):
+        return self._lookup(self.class_by_id, class_id)
+
+    def subject(self, subject_id):
+        return self._lookup(self.subject_by_id, subject_id)
+
+    def room(self, room_id):
+        return self._lookup(self.room_by_id, room_id)
+
+    def teacher(self, teacher_id):
+        return self._lookup(self.teacher_by_id, teacher_id)
+
+
+def read_data_version(db: Session):
+    value = db.execute(select(AppMeta.value).where(AppMeta.key == DATA_VERSION_KEY)).scalar()
+    return int(value) if value is not None else 0
+
+
+def bump_data_version(db: Session):
+    # Вызывается после любых изменений справочников; сохраняется вместе с транзакцией вызывающего
+    version = read_data_version(db) + 1
+    updated = db.execute(
+        update(AppMeta).where(AppMeta.key == DATA_VERSION_KEY).values(value=str(version))
+    ).rowcount
+    if not updated:
+        db.execute(insert(AppMeta).values(key=DATA_VERSION_KEY, value=str(version)))
+    _store.expire()
+    return version
+
+
+def load_reference_data(db: Session, version):
+    def order(model):
+        return db.query(model).order_by(model.id).all()
+
+    return ReferenceData(
+        version,
+        [ClassRow(c.id, c.number, c.letter) for c in order(SchoolClass)],
+        [SubjectRow(s.id, s.name, s.teacher_id, s.hours_per_week) for s in order(Subject)],
+        [RoomRow(r.id, r.name) for r in order(Room)],
+        [TeacherRow(t.id, t.name) for t in order(Teacher)],
+    )
+
+
+class _SnapshotStore:
+    def __init__(self, ttl=REFERENCE_DATA_TTL):
+        self.ttl = ttl
+        self.snapshot = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def expire(self):
+        self.checked_at = 0.0
+
+    def fresh(self):
+        snapshot = self.snapshot
+        if snapshot is not None and time.monotonic() - self.checked_at < self.ttl:
+            return snapshot
+        return None
+
+    def get(self, db: Session):
+        snapshot = self.fresh()
+        if snapshot is not None:
+            return snapshot
+        with self.lock:
+            if self.fresh() is not None:
+                return self.snapshot
+            version = read_data_version(db)
+            if self.snapshot is None or self.snapshot.version != version:
+                self.snapshot = load_reference_data(db, version)
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+    async def get_async(self, db):
+        # Для AsyncSession: запросы идут через run_sync, но без self.lock — в event loop
+        # блокирующая блокировка, удерживаемая через await, остановила бы все запросы
+        snapshot = self.fresh()
+        if snapshot is not None:
+            return snapshot
+        version = await db.run_sync(read_data_version)
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            snapshot = await db.run_sync(load_reference_data, version)
+        with self.lock:
+            if self.snapshot is None or self.snapshot.version <= snapshot.version:
+                self.snapshot = snapshot
+            self.checked_at = time.monotonic()
+            return self.snapshot
+
+
+_store = _SnapshotStore()
+
+
+def get_reference_data(db: Session) -> ReferenceData:
+    return _store.get(db)
+
+
+async def get_reference_data_async(db) -> ReferenceData:
+    return await _store.get_async(db)
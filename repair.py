@@ -0,0 +1,226 @@
+# fast_api/repair.py
+# Инкрементальный ремонт расписания: текущие уроки загружаются в битовую сетку,
+# помечается только то, что сломало изменение (недоступный кабинет, накладка,
+# лишние или недостающие часы), и переставляются только эти уроки и, при
+# необходимости, один соседний урок того же класса. Остальная неделя не меняется.
+# Учебный план — тот, по которому построена активная версия (по её источнику).
+# Лишние часы удаляются только по явному remove_excess=True: план генератора и
+# ручные правки могут расходиться, и молча удалять настоящие уроки нельзя.
+# Занятость и часы считаются отдельно для недель А и Б: уроки А и Б в одном
+# слоте не накладка, а пара, и вместе дают один час в неделю.
+from collections import Counter
+
+from sqlalchemy.orm import Session
+
+from .models import Lesson, ScheduleVersion
+from .genetic import CURRICULUM_BUILDERS
+from .persist import active_lessons, ensure_active_version, move_lessons, touch_version
+from .occupancy import WeekOccupancy, DAY_MASKS, N_DAYS, N_SLOTS, WEEK_MASK, slot_bit
+from .weeks import EVERY_WEEK, WEEK_A, WEEK_B, weeks_of
+
+
+def _anchor(occupancy, weeks, class_id, day):
+    # Слот сразу после последнего урока класса в этот день — так не появляются окна
+    bits = occupancy.day_bits(weeks, class_id, day)
+    return min(bits.bit_length() + 1, N_SLOTS)
+
+
+class Repairer:
+    def __init__(self, occupancy, lessons):
+        self.occupancy = occupancy
+        self.by_slot = {(l.class_id, l.day, l.lesson_number, week): l
+                        for l in lessons for week in weeks_of(l.week_parity)}
+        self.subject_days = Counter((l.class_id, l.subject_id, l.day) for l in lessons)
+
+    def day_order(self, weeks, class_id, subject_id):
+        # Сначала дни, где этого предмета у класса меньше всего, затем наименее загруженные
+        return sorted(range(N_DAYS), key=lambda day: (
+            self.subject_days[(class_id, subject_id, day)],
+            bin(self.occupancy.day_bits(weeks, class_id, day)).count("1"),
+        ))
+
+    def find_slot(self, weeks, class_id, teacher_id, room_ids, subject_id, exclude=None):
+        allowed = WEEK_MASK if exclude is None else ~exclude
+        for day in self.day_order(weeks, class_id, subject_id):
+            for room_id in room_ids:
+                found = self.occupancy.nearest_free(
+                    weeks, class_id, teacher_id, room_id, day, _anchor(self.occupancy, weeks, class_id, day), allowed
+                )
+                if found:
+                    return found[0], found[1], room_id
+        return None
+
+    def place(self, lesson, day, slot, room_id):
+        lesson.day, lesson.lesson_number, lesson.room_id = day, slot, room_id
+        weeks = weeks_of(lesson.week_parity)
+        self.occupancy.place(weeks, lesson.class_id, lesson.teacher_id, room_id, day, slot)
+        for week in weeks:
+            self.by_slot[(lesson.class_id, day, slot, week)] = lesson
+        self.subject_days[(lesson.class_id, lesson.subject_id, day)] += 1
+
+    def unplace(self, lesson):
+        weeks = weeks_of(lesson.week_parity)
+        self.occupancy.remove(weeks, lesson.class_id, lesson.teacher_id, lesson.room_id, lesson.day,
+                              lesson.lesson_number)
+        for week in weeks:
+            self.by_slot.pop((lesson.class_id, lesson.day, lesson.lesson_number, week), None)
+        self.subject_days[(lesson.class_id, lesson.subject_id, lesson.day)] -= 1
+
+    def place_with_ejection(self, lesson, room_ids, room_options):
+        # Минимальная окрестность: освобождаем слот класса, где свободны учитель и кабинет,
+        # переставив стоящий там урок того же класса в другое место. Слот должен
+        # занимать один урок, идущий во все недели переставляемого
+        occupancy = self.occupancy
+        weeks = weeks_of(lesson.week_parity)
+        for day in self.day_order(weeks, lesson.class_id, lesson.subject_id):
+            for slot in range(1, N_SLOTS + 1):
+                blockers = {id(b): b for b in (self.by_slot.get((lesson.class_id, day, slot, w)) for w in weeks)
+                            if b is not None}
+                if len(blockers) != 1:
+                    continue
+                blocker = next(iter(blockers.values()))
+                if not set(weeks) <= set(weeks_of(blocker.week_parity)):
+                    continue
+                for room_id in room_ids:
+                    if occupancy.conflicts(weeks, None, lesson.teacher_id, room_id, day, slot):
+                        continue
+                    self.unplace(blocker)
+                    target = self.find_slot(weeks_of(blocker.week_parity), blocker.class_id, blocker.teacher_id,
+                                            room_options(blocker), blocker.subject_id,
+                                            exclude=slot_bit(day, slot))
+                    if target is None:
+                        self.place(blocker, day, slot, blocker.room_id)
+                        continue
+                    self.place(blocker, *target)
+                    self.place(lesson, day, slot, room_id)
+                    return blocker
+        return None
+
+
+def version_curriculum(db: Session, version_id):
+    # План генератора, построившего версию; у ручной версии плана нет — None
+    builder = CURRICULUM_BUILDERS.get(db.get(ScheduleVersion, version_id).source)
+    return builder(db) if builder else None
+
+
+def repair_schedule(db: Session, unavailable_rooms=(), days=None, curriculum=None, remove_excess=False):
+    unavailable_rooms = set(unavailable_rooms)
+    days = list(range(N_DAYS)) if days is None else list(days)
+
+    version_id = ensure_active_version(db)
+    # Строка версии блокируется до коммита: параллельные правки уроков ждут ремонт
+    touch_version(db, version_id)
+    curriculum = curriculum if curriculum is not None else version_curriculum(db, version_id)
+    if curriculum is None:
+        # Без учебного плана ремонт только переставляет сломанные уроки: ни добавлять,
+        # ни удалять часы ручного расписания не из чего
+        print("⚠️ У версии нет учебного плана генератора — недостающие часы не добавляются")
+        curriculum = []
+    plan = {(item.class_id, item.subject_id): item for item in curriculum}
+    lessons = active_lessons(db).order_by(Lesson.id).all()
+
+    # Недоступные кабинеты блокируются в сетке на выбранные дни
+    blocked = 0
+    for day in days:
+        blocked |= DAY_MASKS[day]
+
+    occupancy = WeekOccupancy((WEEK_A, WEEK_B))
+    for room_id in unavailable_rooms:
+        occupancy.block_room(room_id, blocked)
+
+    # Какие уроки сломаны изменением. Часы считаются по неделям: урок А и урок Б
+    # дают по часу каждый только в своей неделе
+    kept, invalid, removed = [], [], []
+    counts = Counter()
+    for lesson in lessons:
+        key = (lesson.class_id, lesson.subject_id)
+        weeks = weeks_of(lesson.week_parity)
+        if remove_excess and key in plan and any(counts[key + (w,)] >= plan[key].hours for w in weeks):
+            removed.append(lesson)  # лишний час относительно учебного плана
+            continue
+        slot = (lesson.class_id, lesson.teacher_id, lesson.room_id, lesson.day, lesson.lesson_number)
+        if lesson.room_id in unavailable_rooms and lesson.day in days:
+            invalid.append(lesson)
+        elif occupancy.conflicts(weeks, *slot):
+            invalid.append(lesson)  # накладка с уже стоящим уроком
+        else:
+            occupancy.place(weeks, *slot)
+            kept.append(lesson)
+        for week in weeks:
+            counts[key + (week,)] += 1
+
+    def room_options(lesson):
+        item = plan.get((lesson.class_id, lesson.subject_id))
+        options = list(item.room_ids) if item else [lesson.room_id]
+        if lesson.room_id in options:
+            options.remove(lesson.room_id)
+            options.insert(0, lesson.room_id)
+        return [r for r in options if r not in unavailable_rooms] or options
+
+    repairer = Repairer(occupancy, kept)
+
+    # Недостающие часы учебного плана превращаются в новые уроки: общая нехватка —
+    # уроками каждую неделю, остаток в одной из недель — уроками только этой недели
+    added = []
+    for key, item in plan.items():
+        missing = {week: max(item.hours - counts[key + (week,)], 0) for week in (WEEK_A, WEEK_B)}
+        both = min(missing.values())
+        for parity, hours in ((EVERY_WEEK, both), (WEEK_A, missing[WEEK_A] - both),
+                              (WEEK_B, missing[WEEK_B] - both)):
+            for _ in range(hours):
+                added.append(Lesson(version_id=version_id, class_id=item.class_id, subject_id=item.subject_id,
+                                    teacher_id=item.teacher_id, room_id=item.room_ids[0], week_parity=parity))
+
+    moved, unplaced = set(), []
+    for lesson in invalid + added:
+        is_existing = lesson.id is not None
+        # Сначала пробуем сменить только кабинет в то же время
+        if is_existing:
+            same_time = next((r for r in room_options(lesson) if occupancy.is_free(
+                weeks_of(lesson.week_parity), lesson.class_id, lesson.teacher_id, r, lesson.day,
+                lesson.lesson_number)), None)
+            if same_time is not None:
+                repairer.place(lesson, lesson.day, lesson.lesson_number, same_time)
+                moved.add(lesson)
+                continue
+
+        options = room_options(lesson)
+        target = repairer.find_slot(weeks_of(lesson.week_parity), lesson.class_id, lesson.teacher_id, options,
+                                    lesson.subject_id)
+        if target is not None:
+            repairer.place(lesson, *target)
+        else:
+            blocker = repairer.place_with_ejection(lesson, options, room_options)
+            if blocker is None:
+                unplaced.append(lesson)
+                continue
+            moved.add(blocker)
+        if is_existing:
+            moved.add(lesson)
+
+    # Записываем только изменённые строки: ORM обновит лишь перемещённые уроки.
+    # Порядок важен из-за уникальных ограничений на слоты: сначала удаления,
+    # затем перемещённые уроки, затем новые уроки.
+    dropped = [l for l in unplaced if l.id is not None]
+    for lesson in removed + dropped:
+        db.delete(lesson)
+    db.flush()
+    move_lessons(db, moved)
+
+    new = [l for l in added if l not in unplaced]
+    db.add_all(new)
+    db.commit()
+
+    stats = {
+        "kept": len(lessons) - len(removed) - len(dropped) - len(moved),
+        "moved": len(moved),
+        "added": len(new),
+        "removed": len(removed) + len(dropped),
+        "unplaced": len(unplaced),
+        "classes": sorted({l.class_id for l in [*moved, *removed, *dropped, *new]}),
+    }
+    if unplaced:
+        print(f"❌ Ремонт: не удалось поставить {len(unplaced)} уроков")
+    print(f"✅ Ремонт расписания: перемещено {stats['moved']}, добавлено {stats['added']}, "
+          f"удалено {stats['removed']}.")
+    return stats
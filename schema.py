@@ -0,0 +1,128 @@
+# fast_api/schema.py
+# Подготовка схемы БД при старте без лишнего DDL. Отпечаток схемы (хэш DDL всех
+# таблиц и индексов под диалект текущей базы) хранится в app_meta; если он не
+# изменился, старт обходится одним SELECT. Таблицы удаляются только по явному
+# SCHEDULE_RESET_SCHEMA=1 — обычный перезапуск воркера данных не трогает.
+# create_all умеет только создавать недостающие таблицы: если у существующей
+# таблицы не хватает колонок модели или её индексы и уникальные ограничения
+# расходятся с моделью, старт прерывается, а новый отпечаток не сохраняется —
+# иначе следующие старты пропустили бы проверку.
+import hashlib
+
+from sqlalchemy import select, update, insert, inspect, UniqueConstraint
+from sqlalchemy.schema import CreateTable, CreateIndex
+
+from .models import Base, AppMeta
+
+SCHEMA_FINGERPRINT_KEY = "schema_fingerprint"
+
+
+class SchemaMismatch(RuntimeError):
+    pass
+
+
+def schema_fingerprint(dialect):
+    digest = hashlib.sha256()
+    for table in Base.metadata.sorted_tables:
+        digest.update(str(CreateTable(table).compile(dialect=dialect)).encode())
+        for index in sorted(table.indexes, key=lambda i: i.name or ""):
+            digest.update(str(CreateIndex(index).compile(dialect=dialect)).encode())
+    return digest.hexdigest()
+
+
+def stored_fingerprint(connection):
+    if not inspect(connection).has_table(AppMeta.__tablename__):
+        return None
+    return connection.execute(
+        select(AppMeta.value).where(AppMeta.key == SCHEMA_FINGERPRINT_KEY)
+    ).scalar()
+
+
+def missing_columns(connection):
+    # Колонки моделей, которых нет в уже существующих таблицах БД
+    inspector = inspect(connection)
+    missing = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        missing += [f"{table.name}.{column.name}" for column in table.columns if column.name not in existing]
+    return missing
+
+
+def _model_keys(table):
+    # Индексы и уникальные ограничения модели — как наборы колонок, без имён:
+    # имена безымянных ограничений каждая СУБД придумывает по-своему
+    indexes = {(tuple(c.name for c in index.columns), bool(index.unique)) for index in table.indexes}
+    uniques = {tuple(c.name for c in constraint.columns) for constraint in table.constraints
+               if isinstance(constraint, UniqueConstraint)}
+    uniques |= {(column.name,) for column in table.columns if column.unique}
+    return indexes, uniques
+
+
+def _reflected_keys(inspector, table_name):
+    # PostgreSQL отдаёт индекс под уникальным ограничением и как индекс — такие пропускаем
+    indexes = {(tuple(index["column_names"]), bool(index["unique"]))
+               for index in inspector.get_indexes(table_name) if "duplicates_constraint" not in index}
+    uniques = {tuple(constraint["column_names"]) for constraint in inspector.get_unique_constraints(table_name)}
+    return indexes, uniques
+
+
+def index_drift(connection):
+    # Индексы и уникальные ограничения существующих таблиц, которые расходятся с моделями:
+    # «+» — есть в модели, нет в БД; «-» — есть в БД, нет в модели
+    inspector = inspect(connection)
+    drift = []
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        model_indexes, model_uniques = _model_keys(table)
+        db_indexes, db_uniques = _reflected_keys(inspector, table.name)
+        for columns, unique in model_indexes - db_indexes:
+            drift.append(f"+{'unique ' if unique else ''}index {table.name}({', '.join(columns)})")
+        for columns, unique in db_indexes - model_indexes:
+            drift.append(f"-{'unique ' if unique else ''}index {table.name}({', '.join(columns)})")
+        for columns in model_uniques - db_uniques:
+            drift.append(f"+unique {table.name}({', '.join(columns)})")
+        for columns in db_uniques - model_uniques:
+            drift.append(f"-unique {table.name}({', '.join(columns)})")
+    return sorted(drift)
+
+
+def prepare_database(engine, reset=False):
+    # Возвращает True, если выполнялся DDL
+    fingerprint = schema_fingerprint(engine.dialect)
+    with engine.begin() as connection:
+        if not reset and stored_fingerprint(connection) == fingerprint:
+            return False
+
+        if reset:
+            Base.metadata.drop_all(bind=connection)
+            print("⚠️ Схема БД пересоздана: все данные удалены")
+        else:
+            missing = missing_columns(connection)
+            if missing:
+                print(f"❌ В БД нет колонок: {', '.join(missing)}")
+                raise SchemaMismatch(
+                    f"Схема БД устарела (нет колонок: {', '.join(missing)}). Выполните миграцию "
+                    f"или перезапустите с SCHEDULE_RESET_SCHEMA=1 (все данные будут удалены)."
+                )
+            drift = index_drift(connection)
+            if drift:
+                print(f"❌ Индексы БД расходятся с моделями: {'; '.join(drift)}")
+                raise SchemaMismatch(
+                    f"Схема БД устарела (индексы и ограничения: {'; '.join(drift)}). Выполните миграцию "
+                    f"или перезапустите с SCHEDULE_RESET_SCHEMA=1 (все данные будут удалены)."
+                )
+            tables = Base.metadata.sorted_tables
+            absent = [t.name for t in tables if not inspect(connection).has_table(t.name)]
+            if absent and len(absent) < len(tables):  # на пустой базе это обычная установка
+                print(f"⚠️ Созданы недостающие таблицы: {', '.join(absent)}")
+        Base.metadata.create_all(bind=connection)
+
+        updated = connection.execute(
+            update(AppMeta).where(AppMeta.key == SCHEMA_FINGERPRINT_KEY).values(value=fingerprint)
+        ).rowcount
+        if not updated:
+            connection.execute(insert(AppMeta).values(key=SCHEMA_FINGERPRINT_KEY, value=fingerprint))
+    return True
@@ -0,0 +1,127 @@
+# fast_api/seed.py
+# Начальные данные школы. Заливаются только по запросу (SCHEDULE_SEED=1 при старте
+# или python -m fast_api.seed), одной транзакцией и идемпотентно: уже существующие
+# по имени записи не дублируются, поэтому повторный запуск ничего не портит.
+from sqlalchemy.orm import Session
+
+from .models import SchoolClass, Subject, Room, Teacher
+from .refdata import bump_data_version
+
+CLASS_LETTERS = ("А", "Б", "В")
+
+# Учителя — расширенный список
+TEACHER_NAMES = (
+    "Иванов И.И. (алгебра)",
+    "Петрова А.В. (геометрия)",
+    "Сидорова Е.М. (физика)",
+    "Козлов Д.Н. (история)",
+    "Морозова Л.К. (биология)",
+    "Орлова Н.К. (русский язык)",
+    "Васильева Е.М. (английский)",
+    "Лебедев С.П. (литература)",
+    "Николаева Т.С. (химия)",
+    "Фёдоров А.Б. (информатика)",
+    "Смирнова О.П. (физкультура)",
+    "Кузнецова Р.И. (музыка)",
+    "Григорьев Д.М. (ОБЖ)",
+    "Борисова Л.А. (география)",
+    "Тихонов К.Е. (черчение)",
+    "Романова Ю.С. (обществознание)",
+)
+
+# Кабинеты — больше и понятнее
+ROOM_NAMES = (
+    "Кабинет 101 (математика)",
+    "Кабинет 102 (алгебра)",
+    "Кабинет 103 (геометрия)",
+    "Кабинет 201 (физика)",
+    "Кабинет 202 (химия)",
+    "Кабинет 301 (биология)",
+    "Кабинет 302 (география)",
+    "Кабинет 401 (история)",
+    "Кабинет 402 (обществознание)",
+    "Кабинет 501 (русский язык)",
+    "Кабинет 502 (литература)",
+    "Кабинет 601 (английский)",
+    "Кабинет 602 (немецкий)",
+    "Кабинет 701 (информатика)",
+    "Кабинет 702 (черчение)",
+    "Кабинет 801 (музыка)",
+    "Кабинет 802 (ОБЖ)",
+    "Спортзал №1",
+    "Спортзал №2",
+    "Актовый зал",
+    "Библиотека",
+    "Столовая",
+)
+
+# Предметы — (название, учитель, часов в неделю)
+SUBJECTS = (
+    # Алгебра и геометрия — отдельно
+    ("Алгебра", "Иванов И.И. (алгебра)", 4),
+    ("Геометрия", "Петрова А.В. (геометрия)", 2),
+
+    # Основные предметы
+    ("Русский язык", "Орлова Н.К. (русский язык)", 5),
+    ("Литература", "Лебедев С.П. (литература)", 3),
+    ("Физика", "Сидорова Е.М. (физика)", 3),
+    ("Химия", "Николаева Т.С. (химия)", 2),
+    ("Биология", "Морозова Л.К. (биология)", 2),
+    ("История", "Козлов Д.Н. (история)", 2),
+    ("Обществознание", "Романова Ю.С. (обществознание)", 2),
+    ("География", "Борисова Л.А. (география)", 2),
+    ("Информатика", "Фёдоров А.Б. (информатика)", 2),
+    ("Английский", "Васильева Е.М. (английский)", 3),
+    ("Физкультура", "Смирнова О.П. (физкультура)", 2),
+    ("Музыка", "Кузнецова Р.И. (музыка)", 1),
+    ("ОБЖ", "Григорьев Д.М. (ОБЖ)", 1),
+    ("Черчение", "Тихонов К.Е. (черчение)", 1),
+
+    # Для 1–4 классов
+    ("Окружающий мир", "Орлова Н.К. (русский язык)", 3),
+    ("Трудовое воспитание", "Смирнова О.П. (физкультура)", 1),
+    ("ИЗО", "Кузнецова Р.И. (музыка)", 1),
+)
+
+
+def create_initial_data(db: Session):
+    existing_classes = {(c.number, c.letter) for c in db.query(SchoolClass.number, SchoolClass.letter)}
+    existing_teachers = {name for (name,) in db.query(Teacher.name)}
+    existing_rooms = {name for (name,) in db.query(Room.name)}
+    existing_subjects = {name for (name,) in db.query(Subject.name)}
+
+    # 1. Классы: 1А, 1Б, ..., 11В
+    new_rows = [SchoolClass(number=number, letter=letter)
+                for number in range(1, 12) for letter in CLASS_LETTERS
+                if (number, letter) not in existing_classes]
+    # 2–3. Учителя и кабинеты
+    new_rows += [Teacher(name=name) for name in TEACHER_NAMES if name not in existing_teachers]
+    new_rows += [Room(name=name) for name in ROOM_NAMES if name not in existing_rooms]
+    db.add_all(new_rows)
+    db.flush()
+
+    # 4. Предметы — с привязкой к учителям по имени
+    teacher_map = {name: teacher_id for teacher_id, name in db.query(Teacher.id, Teacher.name)}
+    subjects = [Subject(name=name, teacher_id=teacher_map[teacher], hours_per_week=hours)
+                for name, teacher, hours in SUBJECTS if name not in existing_subjects]
+    db.add_all(subjects)
+
+    added = len(new_rows) + len(subjects)
+    if not added:
+        return 0  # Уже есть данные — не добавляем
+    bump_data_version(db)
+    db.commit()
+    print(f"✅ Начальные данные добавлены в БД: {added} записей.")
+    return added
+
+
+if __name__ == "__main__":
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from .config import DATABASE_URL
+    from .schema import prepare_database
+
+    engine = create_engine(DATABASE_URL)
+    prepare_database(engine)
+    with sessionmaker(bind=engine)() as session:
+        create_initial_data(session)
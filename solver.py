@@ -0,0 +1,247 @@
+# fast_api/solver.py
+# Решатель с распространением ограничений: уроки ставятся от самых стеснённых
+# (дефицитные кабинеты, загруженные учителя) к свободным, каждый ход проверяется
+# опережающей проверкой (forward checking), а при тупике выполняется ограниченный
+# возврат. Если бюджет возвратов исчерпан, урок честно считается непоставленным.
+import random
+import time
+
+from sqlalchemy.orm import Session
+
+from .genetic import build_curriculum_from_db
+from .occupancy import Occupancy, N_DAYS, N_SLOTS, N_TIMES, WEEK_MASK, slot_bit, popcount
+from .persist import publish_schedule
+from .metrics import phase, count
+
+PENDING, PLACED, SKIPPED = 0, 1, 2
+
+
+class Unit:
+    __slots__ = ("index", "class_id", "subject_id", "teacher_id", "room_ids", "position")
+
+    def __init__(self, index, item):
+        self.index = index
+        self.class_id = item.class_id
+        self.subject_id = item.subject_id
+        self.teacher_id = item.teacher_id
+        self.room_ids = item.room_ids
+        self.position = None  # (day, slot, room_id)
+
+
+class ConstraintSolver:
+    def __init__(self, curriculum, max_backtracks=2000, time_limit=None, seed=None):
+        self.max_backtracks = max_backtracks
+        self.time_limit = time_limit
+        self.rng = random.Random(seed)
+        self.occupancy = Occupancy()
+
+        self.units = []
+        for item in curriculum:
+            if not item.room_ids:
+                continue
+            for _ in range(item.hours):
+                self.units.append(Unit(len(self.units), item))
+        self.state = [PENDING] * len(self.units)
+
+        # Соседи: уроки, делящие класс или учителя, и группы кабинетов, куда входит кабинет
+        self.by_class, self.by_teacher, self.by_group, self.groups_by_room = {}, {}, {}, {}
+        for unit in self.units:
+            self.by_class.setdefault(unit.class_id, []).append(unit)
+            self.by_teacher.setdefault(unit.teacher_id, []).append(unit)
+            self.by_group.setdefault(unit.room_ids, []).append(unit)
+        for group in self.by_group:
+            for room_id in group:
+                self.groups_by_room.setdefault(room_id, []).append(group)
+
+        if self.units:
+            self.occupancy.reserve(max(u.class_id for u in self.units), max(u.teacher_id for u in self.units),
+                                   max(r for u in self.units for r in u.room_ids))
+
+        self.subject_days = {}
+        self.backtracks = 0
+        self.attempts = 0
+        self.order = self.static_order()
+
+    def static_order(self):
+        # Самые стеснённые — первыми: нагрузка на группу кабинетов, на учителя и на класс
+        room_demand = {}
+        for unit in self.units:
+            room_demand[unit.room_ids] = room_demand.get(unit.room_ids, 0) + 1
+        teacher_load = {t: len(units) for t, units in self.by_teacher.items()}
+        class_load = {c: len(units) for c, units in self.by_class.items()}
+
+        def pressure(unit):
+            return (
+                room_demand[unit.room_ids] / (N_TIMES * len(unit.room_ids)),
+                teacher_load[unit.teacher_id] / N_TIMES,
+                class_load[unit.class_id] / N_TIMES,
+                self.rng.random(),
+            )
+
+        return sorted(self.units, key=pressure, reverse=True)
+
+    def domain(self, unit):
+        # Битовая маска времён, где уроку хватает и класса, и учителя, и хотя бы одного кабинета
+        rooms = self.occupancy.rooms
+        rooms_free = 0
+        for room_id in unit.room_ids:
+            rooms_free |= ~rooms[room_id]
+        busy = self.occupancy.classes[unit.class_id] | self.occupancy.teachers[unit.teacher_id]
+        return ~busy & rooms_free & WEEK_MASK
+
+    def candidates(self, unit):
+        occupancy = self.occupancy
+        day_order = sorted(range(N_DAYS), key=lambda day: (
+            self.subject_days.get((unit.class_id, unit.subject_id, day), 0),
+            popcount(occupancy.day_bits(unit.class_id, day)),
+        ))
+        rooms = sorted(unit.room_ids, key=lambda r: popcount(occupancy.room_mask(r)))
+        for day in day_order:
+            # Ставим вплотную к уже стоящим урокам класса, чтобы не было окон
+            anchor = min(occupancy.day_bits(unit.class_id, day).bit_length() + 1, N_SLOTS)
+            for distance in range(N_SLOTS):
+                for slot in dict.fromkeys((anchor - distance, anchor + distance)):
+                    if not 1 <= slot <= N_SLOTS:
+                        continue
+                    for room_id in rooms:
+                        if occupancy.is_free(unit.class_id, unit.teacher_id, room_id, day, slot):
+                            yield day, slot, room_id
+
+    def wiped_out(self, other, unit, bit, room_id):
+        # Лишился ли сосед последнего варианта именно из-за хода unit в (bit, room_id)
+        occupancy = self.occupancy
+        class_busy = occupancy.classes[other.class_id]
+        teacher_busy = occupancy.teachers[other.teacher_id]
+        if other.class_id == unit.class_id:
+            class_busy &= ~bit
+        if other.teacher_id == unit.teacher_id:
+            teacher_busy &= ~bit
+        if (class_busy | teacher_busy) & bit:
+            return False  # время t было занято и до хода
+        rooms = occupancy.rooms
+        if not any(r == room_id or not rooms[r] & bit for r in other.room_ids):
+            return False
+        return not self.domain(other)
+
+    def forward_check(self, unit, day, slot, room_id):
+        # Ход отвергается, если он отнял последнее время у ещё не поставленного соседа.
+        # Соседи, у которых вариантов не было и до хода, на решение не влияют.
+        bit = slot_bit(day, slot)
+        state = self.state
+        seen = set()
+        for other in self.by_class[unit.class_id] + self.by_teacher[unit.teacher_id]:
+            if state[other.index] == PENDING and other.index not in seen:
+                seen.add(other.index)
+                if self.wiped_out(other, unit, bit, room_id):
+                    return False
+
+        # Соседи только по кабинету теряют время t, лишь если во всей их группе не осталось свободного кабинета
+        rooms = self.occupancy.rooms
+        for group in self.groups_by_room[room_id]:
+            if any(not rooms[r] & bit for r in group):
+                continue
+            for other in self.by_group[group]:
+                if state[other.index] == PENDING and other.index not in seen:
+                    if self.wiped_out(other, unit, bit, room_id):
+                        return False
+        return True
+
+    def place(self, unit, day, slot, room_id):
+        self.occupancy.place(unit.class_id, unit.teacher_id, room_id, day, slot)
+        unit.position = (day, slot, room_id)
+        self.state[unit.index] = PLACED
+        key = (unit.class_id, unit.subject_id, day)
+        self.subject_days[key] = self.subject_days.get(key, 0) + 1
+
+    def unplace(self, unit):
+        day, slot, room_id = unit.position
+        self.occupancy.remove(unit.class_id, unit.teacher_id, room_id, day, slot)
+        unit.position = None
+        self.state[unit.index] = PENDING
+        self.subject_days[(unit.class_id, unit.subject_id, day)] -= 1
+
+    def solve(self, should_stop=None):
+        deadline = time.monotonic() + self.time_limit if self.time_limit else None
+        iterators = [None] * len(self.order)
+        pos = 0
+        while pos < len(self.order):
+            unit = self.order[pos]
+            if self.state[unit.index] == SKIPPED:
+                pos += 1
+                continue
+            if iterators[pos] is None:
+                iterators[pos] = self.candidates(unit)
+
+            placed = False
+            for day, slot, room_id in iterators[pos]:
+                self.attempts += 1
+                self.place(unit, day, slot, room_id)
+                if self.forward_check(unit, day, slot, room_id):
+                    placed = True
+                    break
+                self.unplace(unit)
+            if placed:
+                pos += 1
+                continue
+
+            iterators[pos] = None
+            out_of_budget = (self.backtracks >= self.max_backtracks
+                             or (deadline and time.monotonic() > deadline)
+                             or (should_stop and should_stop()))
+            previous = pos - 1
+            while previous >= 0 and self.state[self.order[previous].index] == SKIPPED:
+                previous -= 1
+            if out_of_budget or previous < 0:
+                # Возвраты исчерпаны — урок остаётся непоставленным
+                self.state[unit.index] = SKIPPED
+                pos += 1
+                continue
+
+            # Ограниченный возврат: снимаем предыдущий урок и пробуем его следующий вариант
+            self.backtracks += 1
+            self.unplace(self.order[previous])
+            pos = previous
+
+        return [u for u in self.units if self.state[u.index] == SKIPPED]
+
+    def rows(self):
+        rows = []
+        for unit in self.units:
+            if unit.position is None:
+                continue
+            day, slot, room_id = unit.position
+            rows.append({
+                "class_id": unit.class_id,
+                "subject_id": unit.subject_id,
+                "teacher_id": unit.teacher_id,
+                "room_id": room_id,
+                "day": day,
+                "lesson_number": slot,
+            })
+        return rows
+
+
+def generate_solver_schedule(db: Session, max_backtracks=2000, time_limit=30, seed=None,
+                             on_progress=None, should_stop=None, curriculum=None):
+    with phase("curriculum"):
+        curriculum = curriculum if curriculum is not None else build_curriculum_from_db(db)
+        solver = ConstraintSolver(curriculum, max_backtracks=max_backtracks, time_limit=time_limit, seed=seed)
+    with phase("placement"):
+        unplaced = solver.solve(should_stop=should_stop)
+    count("placements_attempted", solver.attempts)
+    count("backtracks", solver.backtracks)
+    count("unplaced", len(unplaced))
+    if should_stop and should_stop():
+        print("⏹ Генерация отменена")
+        return None
+
+    with phase("persist"):
+        version_id = publish_schedule(db, solver.rows(), source="solver")
+    if on_progress:
+        on_progress(1, len(unplaced))
+
+    if unplaced:
+        print(f"❌ Не удалось поставить {len(unplaced)} уроков (возвратов: {solver.backtracks})")
+    print(f"✅ Решатель: поставлено {len(solver.units) - len(unplaced)} из {len(solver.units)} уроков, "
+          f"возвратов {solver.backtracks}.")
+    return version_id
@@ -0,0 +1,15 @@
+# fast_api/tests/conftest.py
+# Модули пакета импортируются относительно друг друга — регистрируем корень
+# репозитория как пакет fast_api, как бы ни называлась папка с исходниками.
+import importlib.util
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+if "fast_api" not in sys.modules:
+    spec = importlib.util.spec_from_file_location("fast_api", ROOT / "__init__.py",
+                                                  submodule_search_locations=[str(ROOT)])
+    package = importlib.util.module_from_spec(spec)
+    sys.modules["fast_api"] = package
+    spec.loader.exec_module(package)
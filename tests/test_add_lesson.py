@@ -0,0 +1,84 @@
+# fast_api/tests/test_add_lesson.py
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from fast_api import main, refdata
+from fast_api.models import Base, Lesson, Room, SchoolClass, ScheduleVersion, Subject, Teacher
+
+
+@pytest.fixture
+def db(monkeypatch):
+    # Одно соединение на все потоки: синхронные маршруты выполняются в пуле потоков
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        SchoolClass(id=1, number=5, letter="А"), SchoolClass(id=2, number=5, letter="Б"),
+        Teacher(id=1, name="Иванов"), Teacher(id=2, name="Петрова"),
+        Subject(id=1, name="Музыка", teacher_id=1, hours_per_week=1),
+        Room(id=1, name="Актовый зал"), Room(id=2, name="Мастерская"),
+        ScheduleVersion(id=1, source="manual", is_active=True),
+        Lesson(version_id=1, class_id=1, subject_id=1, teacher_id=1, room_id=1, day=0, lesson_number=1),
+    ])
+    session.commit()
+    monkeypatch.setattr(refdata, "_store", refdata._SnapshotStore())
+    main.app.dependency_overrides[main.get_db] = lambda: session
+    yield session
+    main.app.dependency_overrides.clear()
+    session.close()
+
+
+@pytest.fixture
+def client(db):
+    return TestClient(main.app)
+
+
+def form(**changes):
+    return {"class_id": 2, "subject_id": 1, "teacher_id": 2, "room_id": 2, "day": 0, "lesson_number": 1,
+            **changes}
+
+
+def revision(db):
+    db.expire_all()
+    return db.get(ScheduleVersion, 1).revision
+
+
+def test_conflict_is_rejected_without_writing(db, client):
+    response = client.post("/add_lesson", data=form(room_id=1), follow_redirects=False)
+
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Этот кабинет занят."
+    assert db.query(Lesson).count() == 1
+    assert revision(db) == 0  # блокировка версии откатилась вместе с проверкой
+
+
+def test_unique_constraint_is_reported(db, client, monkeypatch):
+    # Параллельный запрос успел раньше: проверка его урока не видела, а БД — видит
+    monkeypatch.setattr(main, "find_conflicts", lambda db, lessons: {})
+
+    response = client.post("/add_lesson", data=form(class_id=1), follow_redirects=False)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Слот уже занят другим уроком."
+
+    response = client.post("/add_lessons", json=[form(day=2), form(class_id=1, teacher_id=1, room_id=1)])
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Слот уже занят другим уроком."
+    # Пачка откатывается целиком
+    assert db.query(Lesson).count() == 1
+    assert revision(db) == 0
+
+
+def test_added_lesson_bumps_revision(db, client):
+    response = client.post("/add_lesson", data=form(), follow_redirects=False)
+
+    assert response.status_code == 303
+    assert db.query(Lesson).count() == 2
+    assert revision(db) == 1
+
+
+@pytest.mark.parametrize("changes", [{"day": -1}, {"day": 5}, {"lesson_number": 0}, {"lesson_number": 9}])
+def test_slot_out_of_range(client, changes):
+    assert client.post("/add_lesson", data=form(**changes)).status_code == 422
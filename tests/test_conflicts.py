@@ -0,0 +1,68 @@
+# fast_api/tests/test_conflicts.py
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from fast_api.conflicts import find_conflicts
+from fast_api.models import Base, Lesson, Room, SchoolClass, ScheduleVersion, Subject, Teacher
+from fast_api.weeks import EVERY_WEEK, WEEK_A, WEEK_B
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        SchoolClass(id=1, number=5, letter="А"), SchoolClass(id=2, number=5, letter="Б"),
+        Teacher(id=1, name="Иванов"), Teacher(id=2, name="Петрова"),
+        Subject(id=1, name="Музыка", teacher_id=1, hours_per_week=1),
+        Room(id=1, name="Актовый зал"), Room(id=2, name="Мастерская"),
+        ScheduleVersion(id=1, source="manual", is_active=False),
+        ScheduleVersion(id=2, source="manual", is_active=True),
+        Lesson(version_id=2, class_id=1, subject_id=1, teacher_id=1, room_id=1, day=0, lesson_number=1),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def lesson(class_id=2, teacher_id=2, room_id=2, day=0, lesson_number=1, week_parity=EVERY_WEEK):
+    return {"class_id": class_id, "subject_id": 1, "teacher_id": teacher_id, "room_id": room_id,
+            "day": day, "lesson_number": lesson_number, "week_parity": week_parity}
+
+
+def test_reports_every_kind_in_one_query(db):
+    statements = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+    found = find_conflicts(db, [lesson(class_id=1, teacher_id=1, room_id=1), lesson(room_id=1),
+                                lesson(day=1)])
+
+    assert found == {0: ["class", "teacher", "room"], 1: ["room"]}
+    assert len(statements) == 1
+
+
+def test_batch_clashes_with_itself(db):
+    # Кандидаты пачки занимают слоты друг для друга
+    found = find_conflicts(db, [lesson(day=3), lesson(class_id=1, teacher_id=1, day=3)])
+    assert found == {1: ["room"]}
+
+
+def test_inactive_versions_are_ignored(db):
+    db.add(Lesson(version_id=1, class_id=2, subject_id=1, teacher_id=2, room_id=2, day=2, lesson_number=4))
+    db.commit()
+    assert find_conflicts(db, [lesson(day=2, lesson_number=4)]) == {}
+
+
+def test_alternating_weeks(db):
+    db.add(Lesson(version_id=2, class_id=2, subject_id=1, teacher_id=2, room_id=2, day=4, lesson_number=3,
+                  week_parity=WEEK_A))
+    db.commit()
+    # Неделя Б свободна; урок «каждую неделю» задевает и неделю А
+    assert find_conflicts(db, [lesson(day=4, lesson_number=3, week_parity=WEEK_B)]) == {}
+    assert find_conflicts(db, [lesson(day=4, lesson_number=3)]) == {0: ["class", "teacher", "room"]}
+    # Пачка: урок каждую неделю занимает слот и для уроков А/Б после него
+    found = find_conflicts(db, [lesson(class_id=1, teacher_id=1, room_id=1, day=1),
+                                lesson(class_id=1, teacher_id=2, room_id=2, day=1, week_parity=WEEK_B)])
+    assert found == {1: ["class"]}
@@ -0,0 +1,51 @@
+# fast_api/tests/test_persist.py
+import pytest
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+from fast_api.models import Base, Lesson, Room, SchoolClass, ScheduleVersion, Subject, Teacher
+from fast_api.persist import active_lessons, active_version_id, activate_version, publish_schedule
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        SchoolClass(id=1, number=5, letter="А"),
+        Teacher(id=1, name="Иванов"),
+        Subject(id=1, name="Музыка", teacher_id=1, hours_per_week=1),
+        Room(id=1, name="Актовый зал"),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def rows(day):
+    return [{"class_id": 1, "subject_id": 1, "teacher_id": 1, "room_id": 1, "day": day, "lesson_number": 1}]
+
+
+def test_publish_switches_active_version(db):
+    first = publish_schedule(db, rows(0), source="greedy")
+    second = publish_schedule(db, rows(1), source="greedy")
+
+    assert active_version_id(db) == second
+    assert db.scalars(select(ScheduleVersion.id).where(ScheduleVersion.is_active.is_(True))).all() == [second]
+    assert [l.day for l in active_lessons(db)] == [1]
+
+    # Откат к сохранённой версии не переписывает уроки
+    activate_version(db, first)
+    assert [l.day for l in active_lessons(db)] == [0]
+    assert db.query(Lesson).count() == 2
+
+
+def test_publish_collects_old_versions(db):
+    versions = [publish_schedule(db, rows(i % 5), source="greedy", keep=2) for i in range(5)]
+
+    # Активная версия и две последние неактивные; уроки удалённых версий тоже удалены
+    kept = db.scalars(select(ScheduleVersion.id).order_by(ScheduleVersion.id)).all()
+    assert kept == versions[-3:]
+    assert active_version_id(db) == versions[-1]
+    assert sorted(db.scalars(select(Lesson.version_id))) == versions[-3:]
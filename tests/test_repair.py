@@ -0,0 +1,48 @@
+# fast_api/tests/test_repair.py
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from fast_api.genetic import CurriculumItem
+from fast_api.models import Base, Lesson, Room, SchoolClass, ScheduleVersion, Subject, Teacher
+from fast_api.repair import repair_schedule
+from fast_api.weeks import WEEK_A, WEEK_B
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([
+        SchoolClass(id=2, number=5, letter="А"),
+        Teacher(id=1, name="Иванов"), Teacher(id=2, name="Петрова"),
+        Subject(id=1, name="Музыка", teacher_id=1, hours_per_week=1),
+        Subject(id=2, name="ИЗО", teacher_id=2, hours_per_week=1),
+        Room(id=1, name="Актовый зал"), Room(id=2, name="Мастерская"),
+        ScheduleVersion(id=1, source="manual", is_active=True),
+    ])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_repair_keeps_alternating_pair(db):
+    # Урок недели А и урок недели Б в одном слоте класса — пара, а не накладка
+    db.add_all([
+        Lesson(version_id=1, class_id=2, subject_id=1, teacher_id=1, room_id=1, day=0, lesson_number=2,
+               week_parity=WEEK_A),
+        Lesson(version_id=1, class_id=2, subject_id=2, teacher_id=2, room_id=2, day=0, lesson_number=2,
+               week_parity=WEEK_B),
+    ])
+    db.commit()
+    curriculum = [CurriculumItem(2, 1, 1, (1,), 1), CurriculumItem(2, 2, 2, (2,), 1)]
+
+    stats = repair_schedule(db, curriculum=curriculum, remove_excess=True)
+
+    assert stats["moved"] == 0 and stats["removed"] == 0
+    # В каждой неделе по одному часу каждого предмета не хватает ровно в другой неделе
+    added = {(l.subject_id, l.week_parity) for l in db.query(Lesson) if (l.day, l.lesson_number) != (0, 2)}
+    assert added == {(1, WEEK_B), (2, WEEK_A)}
+    pair = db.query(Lesson).filter_by(day=0, lesson_number=2).all()
+    assert sorted(l.week_parity for l in pair) == [WEEK_A, WEEK_B]
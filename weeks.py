@@ -0,0 +1,116 @@
+# fast_api/weeks.py
+# Расписание конкретной недели = недельный шаблон + датированные исключения.
+# Шаблон — уроки активной версии; урок идёт каждую неделю или только по неделям
+# А или Б (Lesson.week_parity). Исключения (ScheduleException) — каникулы, отмены
+# и замены на дату. Неделя собирается из закэшированного шаблона класса и одного
+# запроса исключений по индексу (date, class_id), которые накладываются в памяти.
+# Копии расписания на каждую неделю в БД не хранятся.
+from datetime import timedelta
+
+from sqlalchemy import select, update, insert, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from .config import TERM_START
+from .models import AppMeta, ScheduleException
+from .occupancy import N_SLOTS
+
+EVERY_WEEK, WEEK_A, WEEK_B = 0, 1, 2
+WEEK_NAMES = {WEEK_A: "А", WEEK_B: "Б"}
+EXCEPTION_KINDS = ("cancel", "replace")
+DAYS_IN_WEEK = 7
+EXCEPTIONS_VERSION_KEY = "schedule_exceptions_version"
+
+
+def monday_of(day):
+    return day - timedelta(days=day.weekday())
+
+
+def week_parity(monday):
+    weeks = (monday - monday_of(TERM_START)).days // 7
+    return WEEK_A if weeks % 2 == 0 else WEEK_B
+
+
+def weeks_of(parity):
+    # В какие недели идёт урок: «каждую неделю» занимает слот и в А, и в Б
+    return (WEEK_A, WEEK_B) if parity == EVERY_WEEK else (parity,)
+
+
+def bump_exceptions_version(db: Session):
+    # Счётчик правок исключений: по нему кэши всех воркеров узнают об изменении.
+    # Сохраняется вместе с транзакцией вызывающего
+    value = db.execute(select(AppMeta.value).where(AppMeta.key == EXCEPTIONS_VERSION_KEY)).scalar()
+    version = int(value or 0) + 1
+    updated = db.execute(
+        update(AppMeta).where(AppMeta.key == EXCEPTIONS_VERSION_KEY).values(value=str(version))
+    ).rowcount
+    if not updated:
+        db.execute(insert(AppMeta).values(key=EXCEPTIONS_VERSION_KEY, value=str(version)))
+    return version
+
+
+async def load_exceptions(db: AsyncSession, class_id, monday):
+    # Исключения класса и всей школы за неделю — один запрос по индексу (date, class_id)
+    return (await db.execute(
+        select(ScheduleException.date, ScheduleException.class_id, ScheduleException.lesson_number,
+               ScheduleException.kind, ScheduleException.subject_id, ScheduleException.teacher_id,
+               ScheduleException.room_id, ScheduleException.note)
+        .where(ScheduleException.date >= monday,
+               ScheduleException.date < monday + timedelta(days=DAYS_IN_WEEK),
+               or_(ScheduleException.class_id == class_id, ScheduleException.class_id.is_(None)))
+        .order_by(ScheduleException.id)
+    )).all()
+
+
+def describe_lesson(refdata, subject_id, room_id, teacher_id=None):
+    subject = refdata.subject(subject_id)
+    room = refdata.room(room_id)
+    teacher = refdata.teacher(teacher_id if teacher_id is not None else (subject.teacher_id if subject else None))
+    return (f"{subject.name if subject else '?'} ({room.name if room else '?'}, "
+            f"{teacher.name if teacher else '?'})")
+
+
+def resolve_week(refdata, template, exceptions, monday):
+    # template — строки (day, lesson_number, week_parity, subject_id, room_id) шаблона класса
+    parity = week_parity(monday)
+    cells = {}
+    for lesson in template:
+        if lesson.week_parity in (EVERY_WEEK, parity):
+            cells[(lesson.day, lesson.lesson_number)] = {
+                "subject_id": lesson.subject_id, "room_id": lesson.room_id, "teacher_id": None,
+            }
+
+    # Сначала общие исключения (вся школа, весь день), потом точечные — они их уточняют
+    marks, notes = {}, [""] * DAYS_IN_WEEK
+    for item in sorted(exceptions, key=lambda e: (e.class_id is not None, e.lesson_number is not None)):
+        day = (item.date - monday).days
+        slots = [item.lesson_number] if item.lesson_number is not None else range(1, N_SLOTS + 1)
+        if item.lesson_number is None and item.note:
+            notes[day] = item.note
+        for slot in slots:
+            if item.kind == "cancel":
+                cells.pop((day, slot), None)
+                if item.lesson_number is not None:
+                    marks[(day, slot)] = "Отменён" + (f": {item.note}" if item.note else "")
+                else:
+                    marks.pop((day, slot), None)
+                continue
+            cell = dict(cells.get((day, slot)) or {"subject_id": None, "room_id": None, "teacher_id": None})
+            for field in ("subject_id", "room_id", "teacher_id"):
+                if getattr(item, field) is not None:
+                    cell[field] = getattr(item, field)
+            if cell["subject_id"] is None:
+                continue
+            cells[(day, slot)] = cell
+            marks[(day, slot)] = "Замена" + (f": {item.note}" if item.note else "")
+
+    lessons_week = [[""] * N_SLOTS for _ in range(DAYS_IN_WEEK)]
+    for (day, slot), mark in marks.items():
+        lessons_week[day][slot - 1] = mark
+    for (day, slot), cell in cells.items():
+        if not (0 <= day < DAYS_IN_WEEK and 1 <= slot <= N_SLOTS):
+            continue
+        text = describe_lesson(refdata, cell["subject_id"], cell["room_id"], cell["teacher_id"])
+        mark = marks.get((day, slot))
+        lessons_week[day][slot - 1] = f"{text} — {mark}" if mark else text
+    return {"lessons_week": lessons_week, "day_notes": notes, "week_name": WEEK_NAMES[parity]}